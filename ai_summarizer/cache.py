@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from database.models import Session, SummaryCacheEntry
+from config import Config
+
+class SummaryCache:
+    """AI总结缓存：内存LRU在前，SQLite持久化在后，按TTL和条数淘汰"""
+
+    def __init__(self, ttl: int = None, memory_size: int = None, db_size: int = None):
+        self.ttl = Config.SUMMARY_CACHE_TTL if ttl is None else ttl
+        self.memory_size = Config.SUMMARY_CACHE_SIZE if memory_size is None else memory_size
+        self.db_size = Config.SUMMARY_CACHE_DB_SIZE if db_size is None else db_size
+        self.memory = OrderedDict()  # key -> (创建时间, 内容)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def make_key(self, model: str, prompt_version, tweet_keys) -> str:
+        """根据推文归一化键、模型和提示词版本计算缓存键"""
+        digest = hashlib.sha256()
+        digest.update(f"{model}\x00{prompt_version}".encode('utf-8'))
+        for key in tweet_keys:
+            digest.update(b"\x00" + key.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """读取缓存，未命中或已过期时返回None"""
+        if self.ttl <= 0:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.memory[key]
+
+        session = Session()
+        try:
+            row = session.get(SummaryCacheEntry, key)
+            if row is not None and now - row.created_at < self.ttl:
+                with self.lock:
+                    self.db_hits += 1
+                    self._remember(key, row.created_at, row.content)
+                return row.content
+        finally:
+            session.close()
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, content: str):
+        """写入缓存，并淘汰过期和超出条数上限的记录"""
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, content)
+
+        session = Session()
+        try:
+            session.merge(SummaryCacheEntry(key=key, content=content, created_at=now))
+            session.query(SummaryCacheEntry).filter(SummaryCacheEntry.created_at < now - self.ttl).delete()
+            overflow = session.query(SummaryCacheEntry).count() - self.db_size
+            if overflow > 0:
+                oldest = session.query(SummaryCacheEntry.key).order_by(SummaryCacheEntry.created_at).limit(overflow)
+                session.query(SummaryCacheEntry).filter(SummaryCacheEntry.key.in_(oldest.scalar_subquery())).delete(synchronize_session=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _remember(self, key, created_at, content):
+        """写入内存LRU（调用方需持有锁）"""
+        self.memory[key] = (created_at, content)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        """缓存命中统计，供监控使用"""
+        with self.lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.db_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory)
+            }
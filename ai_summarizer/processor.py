@@ -1,18 +1,58 @@
+import asyncio
+import random
+import re
 import openai
-from openai import AzureOpenAI, OpenAI
+from openai import AsyncAzureOpenAI, AsyncOpenAI
 from config import Config
+from ai_summarizer.cache import SummaryCache
+from ai_summarizer.prompt import PromptBuilder
+from utils.text import normalize_tweet_text
+
+# 总结失败时返回信息的前缀，调用方据此判断结果是否可以复用
+ERROR_PREFIX = "处理推文时发生错误"
+
+# 修改提示词时递增，使旧的总结缓存失效
+PROMPT_VERSION = 2
+
+SYSTEM_PROMPT = "你是一个专业的双语总结助手。你需要提供清晰、格式化的中英文对照总结。请提取推文中最重要的信息点进行总结。"
+
+SUMMARY_REQUIREMENTS = """1. 提取2-3个最重要的核心信息点
+2. 每个信息点都需要中英文对照
+3. 数据指标用`*加粗*`突出显示"""
+
+OUTPUT_FORMAT = """📌 *核心信息概览* | *Key Information*
+━━━━━━━━━━━━━━━━━━━━━
+
+1️⃣ 中文核心信息点一
+   🔹 Key information point 1 in English
+
+2️⃣ 中文核心信息点二
+   🔹 Key information point 2 in English
+
+3️⃣ 中文核心信息点三
+   🔹 Key information point 3 in English"""
+
+# 合并总结中每个账号小节的分隔行
+BATCH_SECTION_RE = re.compile(r'^\s*===\s*@?([A-Za-z0-9_]+)\s*===\s*$', re.MULTILINE)
 
 class AISummarizer:
     def __init__(self):
         self.setup_ai_client()
+        self.cache = SummaryCache()
+        self.prompt_builder = PromptBuilder(self.model)
+        # 限制同时进行的AI请求数量，避免超出服务商配额
+        self.semaphore = asyncio.Semaphore(Config.AI_MAX_CONCURRENCY)
 
     def setup_ai_client(self):
         """根据配置初始化AI客户端"""
         if Config.AI_PROVIDER == 'azure':
-            self.client = AzureOpenAI(
+            # 客户端的重试由 complete_async 控制
+            self.async_client = AsyncAzureOpenAI(
                 api_key=Config.AZURE_OPENAI_KEY,
                 api_version=Config.AZURE_OPENAI_API_VERSION,
-                azure_endpoint=Config.AZURE_OPENAI_ENDPOINT
+                azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+                timeout=Config.AI_REQUEST_TIMEOUT,
+                max_retries=0
             )
             self.model = Config.AZURE_DEPLOYMENT
             self.debug_print(f"初始化Azure OpenAI客户端：\n"
@@ -27,7 +67,12 @@ class AISummarizer:
             if Config.AI_BASE_URL:
                 client_kwargs['base_url'] = Config.AI_BASE_URL
 
-            self.client = OpenAI(**client_kwargs)
+            # 客户端的重试由 complete_async 控制
+            self.async_client = AsyncOpenAI(
+                timeout=Config.AI_REQUEST_TIMEOUT,
+                max_retries=0,
+                **client_kwargs
+            )
             self.model = Config.AI_MODEL
             self.debug_print(f"初始化OpenAI客户端：\n"
                           f"Base URL: {Config.AI_BASE_URL or 'default'}\n"
@@ -37,90 +82,302 @@ class AISummarizer:
         """调试信息打印"""
         print(f"[AI Debug] {message}")
 
-    def summarize_tweets(self, tweets):
-        try:
-            if not tweets:
-                return "没有找到最新推文。"
-                
-            # 按照 order 字段排序推文
-            sorted_tweets = sorted(tweets, key=lambda x: x.get('order', float('inf')))
-            
-            # 准备推文内容和链接，确保一一对应
-            tweet_texts = []
-            tweet_urls = []
-            tweet_previews = []
-            for tweet in sorted_tweets:
-                # 提取推文正文，去除用户名和时间信息
-                text = tweet['text']
-                # 检查是否为置顶推文
-                is_pinned = tweet.get('pinned', False)
-                # 如果是置顶推文，添加标识
-                if is_pinned:
-                    text = '📌 ' + text
-                # 移除包含 @ 的用户名信息
-                text = ' '.join([word for word in text.split() if not word.startswith('@')])
-                # 移除日期信息（通常在推文末尾，格式如 Jan 28）
-                text = ' '.join([word for word in text.split() if not any(month in word for month in ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])])
-                
-                tweet_texts.append(text)
-                tweet_urls.append(tweet.get('url', ''))
-                # 生成推文预览（前10个单词），保留置顶标识
-                words = text.split()
-                preview = ' '.join(words[:10]) + '...' if len(words) > 10 else text
-                tweet_previews.append(preview)
-            
-            text = "\n".join(tweet_texts)
-            
-            self.debug_print(f"准备发送请求到{Config.AI_PROVIDER.upper()}")
-            
-            # 计算最大长度限制
-            max_tokens = 800
+    def prepare_tweets(self, tweets):
+        """整理推文，返回 (推文正文列表, 链接列表, 预览列表, 归一化键列表)，四者一一对应"""
+        # 按照 order 字段排序推文
+        sorted_tweets = sorted(tweets, key=lambda x: x.get('order', float('inf')))
+        
+        tweet_texts = []
+        tweet_urls = []
+        tweet_previews = []
+        tweet_keys = []
+        for tweet in sorted_tweets:
+            if 'key' in tweet:
+                # TwitterClient 已经归一化过的推文直接复用
+                text = f"📌 {tweet['text']}" if tweet.get('pinned') else tweet['text']
+                key = tweet['key']
+            else:
+                normalized = normalize_tweet_text(tweet['text'])
+                if tweet.get('pinned'):
+                    normalized = normalized._replace(pinned=True)
+                text = normalized.display_text
+                key = normalized.key
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的双语总结助手。你需要提供清晰、格式化的中英文对照总结。请提取推文中最重要的信息点进行总结。"},
-                    {
-                        "role": "user",
-                        "content": f"""请对以下推文内容进行双语总结：
-
-1. 提取2-3个最重要的核心信息点
-2. 每个信息点都需要中英文对照
-3. 数据指标用`*加粗*`突出显示
+            tweet_texts.append(text)
+            tweet_urls.append(tweet.get('url', ''))
+            tweet_keys.append(key)
+            # 生成推文预览（前10个单词），保留置顶标识
+            words = text.split()
+            preview = ' '.join(words[:10]) + '...' if len(words) > 10 else text
+            tweet_previews.append(preview)
+        return tweet_texts, tweet_urls, tweet_previews, tweet_keys
+
+    def build_messages(self, text):
+        """构造发送给模型的对话消息"""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"""请对以下推文内容进行双语总结：
+
+{SUMMARY_REQUIREMENTS}
 
 推文内容：
 {text}
 
 输出格式：
-📌 *核心信息概览* | *Key Information*
-━━━━━━━━━━━━━━━━━━━━━
+{OUTPUT_FORMAT}"""
+            }
+        ]
 
-1️⃣ 中文核心信息点一
-   🔹 Key information point 1 in English
+    def build_reduce_messages(self, partial_summaries):
+        """构造map-reduce中合并各批总结的对话消息"""
+        partials = "\n\n".join(
+            f"【第{i}批】\n{summary}" for i, summary in enumerate(partial_summaries, 1)
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"""以下是同一账号多批推文的分批总结，请合并为一份完整的双语总结：
 
-2️⃣ 中文核心信息点二
-   🔹 Key information point 2 in English
+{SUMMARY_REQUIREMENTS}
 
-3️⃣ 中文核心信息点三
-   🔹 Key information point 3 in English"""
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=max_tokens
-            )
+分批总结：
+{partials}
+
+输出格式：
+{OUTPUT_FORMAT}"""
+            }
+        ]
+
+    def build_batch_messages(self, account_texts):
+        """构造多账号合并总结的对话消息，account_texts为 {用户名: 推文内容}"""
+        sections = "\n\n".join(
+            f"=== @{username} ===\n{text}" for username, text in account_texts.items()
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"""请分别对以下{len(account_texts)}个账号的推文内容进行双语总结，每个账号单独总结：
+
+{SUMMARY_REQUIREMENTS}
+
+每个账号的总结以单独一行 `=== @用户名 ===` 开头，按输入顺序输出，不要遗漏任何账号。
+
+推文内容：
+{sections}
+
+每个账号的输出格式：
+=== @用户名 ===
+{OUTPUT_FORMAT}"""
+            }
+        ]
+
+    def split_batch_content(self, content, usernames):
+        """按 `=== @用户名 ===` 分隔行拆分合并总结，返回 {用户名: 总结}"""
+        parts = BATCH_SECTION_RE.split(content)
+        lookup = {username.lower(): username for username in usernames}
+        sections = {}
+        for name, body in zip(parts[1::2], parts[2::2]):
+            username = lookup.get(name.lower())
+            if username and body.strip():
+                sections[username] = body.strip()
+        return sections
+
+    def build_preview_section(self, tweet_previews, tweet_urls):
+        """生成原始推文预览部分"""
+        preview_section = "\n\n📝 *原始推文* | *Original Tweets*\n━━━━━━━━━━━━━━━━━━━━━\n\n"
+        for i, (preview, url) in enumerate(zip(tweet_previews, tweet_urls), 1):
+            preview_section += f"{i}. {preview}\n   🔗 {url}\n\n"
+        return preview_section
+
+    def is_retryable(self, error) -> bool:
+        """限流、超时、连接错误和5xx错误可以重试"""
+        if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def retry_delay(self, error, attempt: int) -> float:
+        """重试等待时间：优先遵循Retry-After，否则使用带抖动的指数退避"""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(Config.AI_RETRY_BASE_DELAY * (2 ** attempt), 30) * random.uniform(0.5, 1.5)
+
+    async def complete_async(self, messages, max_tokens: int = 800):
+        """异步调用模型，受并发上限约束，限流和服务端错误时自动重试"""
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    response = await self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=max_tokens
+                    )
+                return response.choices[0].message.content
+            except Exception as e:
+                if attempt >= Config.AI_MAX_RETRIES or not self.is_retryable(e):
+                    raise
+                delay = self.retry_delay(e, attempt)
+                attempt += 1
+                self.debug_print(f"请求失败（{type(e).__name__}），{delay:.1f} 秒后进行第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+
+    async def summarize_tweets_stream(self, tweets):
+        """流式生成总结，每收到新内容就产出当前已生成的完整文本，最后产出带推文预览的最终结果"""
+        if not tweets:
+            yield "没有找到最新推文。"
+            return
+
+        chunks = self.prompt_builder.build(tweets)
+        if len(chunks) > 1:
+            # 推文过多需要分批总结时无法流式输出
+            yield await self.summarize_tweets_async(tweets)
+            return
+        tweet_texts, tweet_urls, tweet_previews, tweet_keys = self.prepare_tweets(chunks[0])
+        preview_section = self.build_preview_section(tweet_previews, tweet_urls)
+        cache_key = self.cache.make_key(self.model, PROMPT_VERSION, tweet_keys)
+        content = await asyncio.to_thread(self.cache.get, cache_key)
+        if content is not None:
+            self.debug_print("命中总结缓存")
+            yield content + preview_section
+            return
+
+        self.debug_print(f"准备发送流式请求到{Config.AI_PROVIDER.upper()}")
+        attempt = 0
+        content = ""
+        while True:
+            try:
+                async with self.semaphore:
+                    stream = await self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=self.build_messages("\n".join(tweet_texts)),
+                        temperature=0.7,
+                        max_tokens=800,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            content += chunk.choices[0].delta.content
+                            yield content
+                break
+            except Exception as e:
+                # 已经输出部分内容后不再重试，避免重复内容
+                if content or attempt >= Config.AI_MAX_RETRIES or not self.is_retryable(e):
+                    error_message = f"{ERROR_PREFIX}：{str(e)}"
+                    self.debug_print(error_message)
+                    yield error_message
+                    return
+                delay = self.retry_delay(e, attempt)
+                attempt += 1
+                self.debug_print(f"请求失败（{type(e).__name__}），{delay:.1f} 秒后进行第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+
+        self.debug_print(f"成功收到{Config.AI_PROVIDER.upper()}流式响应")
+        await asyncio.to_thread(self.cache.set, cache_key, content)
+        yield content + preview_section
+
+    async def summarize_batch_async(self, accounts):
+        """多账号合并总结：未命中缓存的账号合并为一次AI请求，返回 {用户名: 总结}"""
+        prepared = {}
+        results = {}
+        oversized = []
+        for username, tweets in accounts.items():
+            chunks = self.prompt_builder.build(tweets)
+            if len(chunks) > 1:
+                # 推文过多的账号单独做map-reduce总结
+                oversized.append(username)
+                continue
+            tweet_texts, tweet_urls, tweet_previews, tweet_keys = self.prepare_tweets(chunks[0])
+            cache_key = self.cache.make_key(self.model, PROMPT_VERSION, tweet_keys)
+            prepared[username] = (cache_key, "\n".join(tweet_texts), tweet_previews, tweet_urls)
+            content = await asyncio.to_thread(self.cache.get, cache_key)
+            if content is not None:
+                results[username] = content + self.build_preview_section(tweet_previews, tweet_urls)
+
+        pending = [username for username in accounts if username not in results and username not in oversized]
+        for start in range(0, len(pending), Config.DIGEST_MAX_ACCOUNTS):
+            chunk = pending[start:start + Config.DIGEST_MAX_ACCOUNTS]
+            sections = {}
+            if len(chunk) > 1:
+                try:
+                    self.debug_print(f"合并总结 {len(chunk)} 个账号")
+                    content = await self.complete_async(
+                        self.build_batch_messages({username: prepared[username][1] for username in chunk}),
+                        max_tokens=min(500 * len(chunk), 4000)
+                    )
+                    sections = self.split_batch_content(content, chunk)
+                except Exception as e:
+                    self.debug_print(f"合并总结失败，改为逐个总结: {str(e)}")
+
+            for username, content in sections.items():
+                cache_key, _, tweet_previews, tweet_urls = prepared[username]
+                await asyncio.to_thread(self.cache.set, cache_key, content)
+                results[username] = content + self.build_preview_section(tweet_previews, tweet_urls)
+
+            # 合并结果中缺失的账号单独总结
+            missing = [username for username in chunk if username not in sections]
+            summaries = await asyncio.gather(*[self.summarize_tweets_async(accounts[username]) for username in missing])
+            for username, summary in zip(missing, summaries):
+                results[username] = summary
+
+        summaries = await asyncio.gather(*[self.summarize_tweets_async(accounts[username]) for username in oversized])
+        results.update(zip(oversized, summaries))
+
+        return {username: results[username] for username in accounts}
+
+    async def summarize_map_reduce(self, chunks):
+        """推文超出输入预算时分批总结，再合并各批总结"""
+        tweets = [tweet for chunk in chunks for tweet in chunk]
+        tweet_texts, tweet_urls, tweet_previews, tweet_keys = self.prepare_tweets(tweets)
+        cache_key = self.cache.make_key(self.model, f"{PROMPT_VERSION}-map-reduce", tweet_keys)
+        content = await asyncio.to_thread(self.cache.get, cache_key)
+        if content is None:
+            self.debug_print(f"推文超出输入预算，分 {len(chunks)} 批总结后合并")
+            partial_summaries = await asyncio.gather(*[
+                self.complete_async(self.build_messages("\n".join(self.prepare_tweets(chunk)[0])))
+                for chunk in chunks
+            ])
+            content = await self.complete_async(self.build_reduce_messages(partial_summaries))
+            await asyncio.to_thread(self.cache.set, cache_key, content)
+        return content + self.build_preview_section(tweet_previews, tweet_urls)
+
+    async def summarize_tweets_async(self, tweets):
+        """总结推文：命中缓存直接返回，推文超出输入预算时做map-reduce总结，不阻塞事件循环"""
+        try:
+            if not tweets:
+                return "没有找到最新推文。"
+                
+            chunks = self.prompt_builder.build(tweets)
+            if len(chunks) > 1:
+                return await self.summarize_map_reduce(chunks)
+            tweet_texts, tweet_urls, tweet_previews, tweet_keys = self.prepare_tweets(chunks[0])
+            text = "\n".join(tweet_texts)
             
-            self.debug_print(f"成功收到{Config.AI_PROVIDER.upper()}响应")
-            content = response.choices[0].message.content
+            # 相同推文、模型和提示词版本的总结直接复用（缓存可能访问数据库，放到线程中执行）
+            cache_key = self.cache.make_key(self.model, PROMPT_VERSION, tweet_keys)
+            content = await asyncio.to_thread(self.cache.get, cache_key)
+            if content is None:
+                self.debug_print(f"准备发送请求到{Config.AI_PROVIDER.upper()}")
+                content = await self.complete_async(self.build_messages(text))
+                self.debug_print(f"成功收到{Config.AI_PROVIDER.upper()}响应")
+                await asyncio.to_thread(self.cache.set, cache_key, content)
+            else:
+                self.debug_print("命中总结缓存")
             
             # 添加推文预览部分
-            preview_section = "\n\n📝 *原始推文* | *Original Tweets*\n━━━━━━━━━━━━━━━━━━━━━\n\n"
-            for i, (preview, url) in enumerate(zip(tweet_previews, tweet_urls), 1):
-                preview_section += f"{i}. {preview}\n   🔗 {url}\n\n"
-            
-            return content + preview_section
+            return content + self.build_preview_section(tweet_previews, tweet_urls)
 
         except Exception as e:
-            error_message = f"处理推文时发生错误：{str(e)}"
+            error_message = f"{ERROR_PREFIX}：{str(e)}"
             self.debug_print(error_message)
             return error_message
 
@@ -0,0 +1,149 @@
+import re
+from config import Config
+from utils.text import normalize_tweet_text
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 为可选依赖，未安装时使用近似估算
+    tiktoken = None
+
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+URL_RE = re.compile(r'https?://\S+')
+RETWEET_RE = re.compile(r'^(?:📌 )?rt\b:?\s*')
+WORD_RE = re.compile(r'\w+')
+
+
+class TokenEstimator:
+    """估算文本的token数：安装了tiktoken时精确计算，否则按字符类型近似"""
+
+    def __init__(self, model: str = None):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model or '')
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        # 中日韩文字约1个token一个字，其余约4个字符一个token
+        cjk = len(CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断到不超过max_tokens，末尾加省略号"""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text)[:max_tokens]).rstrip() + '…'
+        # 二分查找满足预算的最长前缀
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + '…'
+
+
+def get_input_budget(model: str) -> int:
+    """读取模型的输入token预算，AI_MODEL_TOKEN_BUDGETS 格式为 model:budget,model:budget"""
+    for item in Config.AI_MODEL_TOKEN_BUDGETS.split(','):
+        name, _, budget = item.strip().partition(':')
+        if name and budget and name.strip() == model:
+            return int(budget)
+    return Config.AI_INPUT_TOKEN_BUDGET
+
+
+class PromptBuilder:
+    """在token预算内整理推文：去重、截断过长推文、按互动数据取舍，必要时拆分为多批"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.budget = get_input_budget(model)
+        self.estimator = TokenEstimator(model)
+
+    @staticmethod
+    def engagement(tweet) -> int:
+        """互动分数：转推权重高于点赞"""
+        stats = tweet.get('stats') or {}
+        def number(key):
+            try:
+                return int(stats.get(key, 0))
+            except (TypeError, ValueError):
+                return 0
+        return number('likes') + 2 * number('retweets') + number('replies') + number('quotes')
+
+    @staticmethod
+    def dedup_key(tweet):
+        """基于归一化键去掉转推前缀和链接后的词集合，用于识别转推和近似重复的推文
+
+        只有链接或表情、没有词的推文改用保留链接的完整键，避免被当作彼此的重复
+        """
+        key = tweet.get('key') or normalize_tweet_text(tweet['text']).key
+        key = RETWEET_RE.sub('', key)
+        words = frozenset(WORD_RE.findall(URL_RE.sub('', key)))
+        return words or frozenset([key.strip(' :')])
+
+    def dedupe(self, tweets):
+        """去除转推和近似重复的推文，重复时保留互动更高的一条"""
+        kept = []
+        keys = []
+        for tweet in sorted(tweets, key=self.engagement, reverse=True):
+            key = self.dedup_key(tweet)
+            duplicate = False
+            for other in keys:
+                union = len(key | other)
+                # 词集合的Jaccard相似度超过0.9视为重复
+                if union and len(key & other) / union >= 0.9:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(tweet)
+                keys.append(key)
+        return kept
+
+    def build(self, tweets, allow_split: bool = True):
+        """返回推文分批列表；不超预算时只有一批，超出较多且允许拆分时分为多批做map-reduce总结"""
+        tweets = self.dedupe(tweets)
+        # 截断过长的推文（复制一份，不修改调用方的数据）
+        tweets = [
+            dict(tweet, text=self.estimator.truncate(tweet['text'], Config.AI_MAX_TWEET_TOKENS))
+            for tweet in tweets
+        ]
+        costs = {id(tweet): self.estimator.count(tweet['text']) + 1 for tweet in tweets}
+        total = sum(costs.values())
+
+        by_order = lambda tweet: tweet.get('order', float('inf'))
+        if total <= self.budget:
+            return [sorted(tweets, key=by_order)]
+
+        if allow_split and total > self.budget * Config.AI_MAP_REDUCE_FACTOR:
+            # 推文量很大：按时间顺序切成多批，每批不超过预算
+            chunks = []
+            current = []
+            used = 0
+            for tweet in sorted(tweets, key=by_order):
+                cost = costs[id(tweet)]
+                if current and used + cost > self.budget:
+                    chunks.append(current)
+                    current = []
+                    used = 0
+                current.append(tweet)
+                used += cost
+            if current:
+                chunks.append(current)
+            return chunks
+
+        # 略超预算：按互动数据从高到低保留，直到用完预算
+        selected = []
+        used = 0
+        for tweet in sorted(tweets, key=self.engagement, reverse=True):
+            cost = costs[id(tweet)]
+            if used + cost > self.budget:
+                continue
+            selected.append(tweet)
+            used += cost
+        return [sorted(selected, key=by_order)]
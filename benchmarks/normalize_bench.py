@@ -0,0 +1,66 @@
+"""对比推文文本归一化的旧实现（多次split + 逐词匹配月份）与单次扫描实现
+
+用法：
+    python benchmarks/normalize_bench.py [推文条数]
+"""
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text import normalize_tweet_text
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+WORDS = ['bitcoin', 'launch', 'today', 'update', 'price', 'market', 'thread', 'new', 'release', '发布', '更新', '市场']
+
+def legacy_normalize(text: str) -> str:
+    """旧实现：TwitterClient.clean_tweet_text 之后 AISummarizer 再过滤一遍"""
+    is_pinned = '📌' in text or 'Pinned' in text
+    text = text.replace('Pinned', '📌')
+    text = ' '.join([word for word in text.split() if not word.startswith('@')])
+    text = ' '.join([word for word in text.split() if not any(month in word for month in MONTHS)])
+    text = ' '.join([word for word in text.split() if not (word.endswith(('h', 'd', 'm')) and word[:-1].isdigit())])
+    if is_pinned and not text.startswith('📌'):
+        text = '📌 ' + text
+    text = text.strip()
+    text = ' '.join([word for word in text.split() if not word.startswith('@')])
+    text = ' '.join([word for word in text.split() if not any(month in word for month in MONTHS)])
+    return text
+
+def make_corpus(size: int):
+    """生成包含提及、日期、相对时间和链接的推文语料"""
+    rng = random.Random(42)
+    corpus = []
+    for i in range(size):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 40))]
+        words.insert(rng.randint(0, len(words)), f"@user{i % 97}")
+        words.append(f"https://t.co/{i:08x}")
+        words.append(f"{rng.choice(MONTHS)} {rng.randint(1, 28)}")
+        if i % 5 == 0:
+            words.append(f"{rng.randint(1, 23)}h")
+        if i % 50 == 0:
+            words.insert(0, 'Pinned')
+        corpus.append(' '.join(words))
+    return corpus
+
+def bench(func, corpus, rounds=3):
+    """返回每条推文的平均耗时（微秒）"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in corpus:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(corpus) * 1e6
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = make_corpus(size)
+    print(f"推文条数: {size}")
+    print(f"旧实现:       {bench(legacy_normalize, corpus):8.2f} μs/条")
+    print(f"单次扫描实现: {bench(normalize_tweet_text, corpus):8.2f} μs/条")
+
+if __name__ == "__main__":
+    main()
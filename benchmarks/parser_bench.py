@@ -0,0 +1,47 @@
+"""对比各解析器后端在已保存nitter页面上的解析速度
+
+用法：
+    python benchmarks/parser_bench.py [HTML文件或目录 ...]
+
+默认读取 CAPTURE_DIR 目录下抓取时保存的页面（.html 或 .html.gz）。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from twitter.capture import load_captures
+from twitter.parser import PARSERS
+
+def bench(parser, pages, rounds):
+    """返回 (每页平均耗时毫秒, 解析出的推文总数)"""
+    found = sum(len(parser.parse(page, 100)) for page in pages)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            parser.parse(page, 100)
+    elapsed = time.perf_counter() - started
+    return elapsed / (rounds * len(pages)) * 1000, found
+
+def main():
+    pages = load_captures(sys.argv[1:] or [Config.CAPTURE_DIR])
+    if not pages:
+        print("没有找到可用的HTML页面，请先设置 CAPTURE_SAMPLE_RATE 保存抓取的页面，或通过参数指定文件")
+        return
+
+    rounds = int(os.getenv('BENCH_ROUNDS', '20'))
+    print(f"页面数: {len(pages)}，轮数: {rounds}")
+    print(f"{'解析器':<12}{'每页耗时(ms)':>14}{'推文数':>10}")
+    for name, parser_cls in PARSERS.items():
+        try:
+            parser = parser_cls()
+        except ImportError as e:
+            print(f"{name:<12}{'跳过：' + str(e):>14}")
+            continue
+        per_page, found = bench(parser, pages, rounds)
+        print(f"{name:<12}{per_page:>14.2f}{found:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,100 @@ class Config:
     
     # 调试配置
     DEBUG_CRAWLER = os.getenv('DEBUG_CRAWLER', 'false').lower() == 'true'
+    # 抓取页面保存：抽样比例（0表示关闭）、保存目录、最多保留的文件数和总大小（字节）
+    CAPTURE_SAMPLE_RATE = float(os.getenv('CAPTURE_SAMPLE_RATE', '0'))
+    CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv('CAPTURE_DIR', 'temp'))
+    CAPTURE_MAX_FILES = int(os.getenv('CAPTURE_MAX_FILES', '200'))
+    CAPTURE_MAX_BYTES = int(os.getenv('CAPTURE_MAX_BYTES', str(50 * 1024 * 1024)))
     
-    # 数据库配置
-    DATABASE_URL = "sqlite:///twitter_monitor.db"
\ No newline at end of file
+    # 对冲请求配置：同时请求的nitter实例数量，以及追加下一个实例前的等待秒数
+    NITTER_HEDGE_WIDTH = int(os.getenv('NITTER_HEDGE_WIDTH', '3'))
+    NITTER_HEDGE_DELAY = float(os.getenv('NITTER_HEDGE_DELAY', '0.5'))
+    
+    # nitter实例注册表配置：实例列表刷新间隔（秒）、连续失败多少次后熔断、熔断基础时长（秒）
+    NITTER_INSTANCE_TTL = int(os.getenv('NITTER_INSTANCE_TTL', '3600'))
+    NITTER_CIRCUIT_THRESHOLD = int(os.getenv('NITTER_CIRCUIT_THRESHOLD', '3'))
+    NITTER_CIRCUIT_COOLDOWN = int(os.getenv('NITTER_CIRCUIT_COOLDOWN', '300'))
+    
+    # 连接池配置：每个实例的最大并发连接数、保持的空闲长连接总数、是否对质询页面启用 cloudscraper
+    NITTER_MAX_CONNECTIONS_PER_HOST = int(os.getenv('NITTER_MAX_CONNECTIONS_PER_HOST', '4'))
+    # 每个实例的自适应限流：最大请求速率（次/秒）、退避后的最低速率、空闲时允许的突发请求数
+    NITTER_HOST_MAX_RATE = float(os.getenv('NITTER_HOST_MAX_RATE', '1'))
+    NITTER_HOST_MIN_RATE = float(os.getenv('NITTER_HOST_MIN_RATE', '0.05'))
+    NITTER_HOST_BURST = float(os.getenv('NITTER_HOST_BURST', '3'))
+    # 页面解析结果缓存：有效期（秒）、交互请求可使用的过期结果最长时间（秒）、缓存条目数
+    NITTER_CACHE_TTL = int(os.getenv('NITTER_CACHE_TTL', '60'))
+    NITTER_CACHE_STALE_TTL = int(os.getenv('NITTER_CACHE_STALE_TTL', '600'))
+    NITTER_CACHE_SIZE = int(os.getenv('NITTER_CACHE_SIZE', '512'))
+    NITTER_BULK_CONCURRENCY = int(os.getenv('NITTER_BULK_CONCURRENCY', '8'))  # 批量抓取时同时抓取的账号数
+    NITTER_MAX_KEEPALIVE = int(os.getenv('NITTER_MAX_KEEPALIVE', '32'))
+    NITTER_CLOUDSCRAPER_FALLBACK = os.getenv('NITTER_CLOUDSCRAPER_FALLBACK', 'true').lower() == 'true'
+    
+    # 页面解析器：auto（自动选择已安装的最快后端）、selectolax、lxml、soup、heuristic
+    NITTER_PARSER = os.getenv('NITTER_PARSER', 'auto').lower()
+    NITTER_MAX_PAGES = int(os.getenv('NITTER_MAX_PAGES', '5'))  # 最多翻页数，每页约20条推文
+    
+    # 合并请求配置：相同账号的抓取和总结结果复用时长（秒）
+    COALESCE_TTL = int(os.getenv('COALESCE_TTL', '60'))
+    
+    # AI请求配置：最大并发请求数、单次请求超时（秒）、最大重试次数、重试基础等待（秒）
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))
+    AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', '60'))
+    AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))
+    AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', '1'))
+    
+    # 提示词预算配置：默认输入token预算、按模型覆盖（model:budget,...）、单条推文token上限、
+    # 超出预算多少倍时改用分批总结（map-reduce）
+    AI_INPUT_TOKEN_BUDGET = int(os.getenv('AI_INPUT_TOKEN_BUDGET', '3000'))
+    AI_MODEL_TOKEN_BUDGETS = os.getenv('AI_MODEL_TOKEN_BUDGETS', '')
+    AI_MAX_TWEET_TOKENS = int(os.getenv('AI_MAX_TWEET_TOKENS', '280'))
+    AI_MAP_REDUCE_FACTOR = float(os.getenv('AI_MAP_REDUCE_FACTOR', '2'))
+    
+    # 流式总结配置：/get_tweets 是否边生成边更新消息，以及两次编辑的最小间隔（秒）
+    STREAM_SUMMARIES = os.getenv('STREAM_SUMMARIES', 'true').lower() == 'true'
+    STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))
+    
+    # AI总结缓存配置：有效期（秒，0为关闭）、内存LRU条数、数据库保留条数
+    SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', '86400'))
+    SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '256'))
+    SUMMARY_CACHE_DB_SIZE = int(os.getenv('SUMMARY_CACHE_DB_SIZE', '10000'))
+    
+    # 合并摘要配置：off（每个任务单独总结）、digest（合并为一条摘要）、split（合并请求、分别发送）
+    DIGEST_MODE = os.getenv('DIGEST_MODE', 'off').lower()
+    DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', '2'))  # 收集同一时间点任务的等待秒数
+    DIGEST_MAX_ACCOUNTS = int(os.getenv('DIGEST_MAX_ACCOUNTS', '8'))  # 单次请求最多合并的账号数
+    
+    # 错峰调度：启动偏移窗口（秒，0为不错峰）、每秒最多启动的抓取任务数（0为不限）、相对用户选择时间的最晚启动时间（秒）
+    SCHEDULE_SPREAD_WINDOW = int(os.getenv('SCHEDULE_SPREAD_WINDOW', '120'))
+    SCHEDULE_MAX_STARTS = float(os.getenv('SCHEDULE_MAX_STARTS', '2'))
+    SCHEDULE_DEADLINE = int(os.getenv('SCHEDULE_DEADLINE', '300'))
+    
+    # 持久化调度：重启后错过的任务在多少秒内仍补执行、启动时每批读取的任务数
+    SCHEDULE_MISFIRE_GRACE = int(os.getenv('SCHEDULE_MISFIRE_GRACE', '3600'))
+    SCHEDULE_LOAD_CHUNK = int(os.getenv('SCHEDULE_LOAD_CHUNK', '1000'))
+    
+    # 预取：在发送时间前多少秒开始抓取和总结（0为不预取）、预取结果的最长有效时间（秒）
+    PREFETCH_LEAD = int(os.getenv('PREFETCH_LEAD', '180'))
+    PREFETCH_MAX_AGE = int(os.getenv('PREFETCH_MAX_AGE', '600'))
+    
+    # worker模式：抓取和总结由独立的worker进程（python worker.py）执行，bot进程只负责调度和发送
+    WORKER_MODE = os.getenv('WORKER_MODE', 'false').lower() == 'true'
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', str(os.cpu_count() or 1)))  # worker进程数
+    WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '2'))  # 每个worker进程同时执行的任务数
+    WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '2'))  # 队列轮询间隔（秒）
+    WORKER_JOB_TIMEOUT = int(os.getenv('WORKER_JOB_TIMEOUT', '600'))  # 任务超时未完成则由其他worker重新领取（秒）
+    WORKER_MAX_ATTEMPTS = int(os.getenv('WORKER_MAX_ATTEMPTS', '3'))  # 任务最多执行次数
+    
+    # Telegram发送限流：全局每秒消息数、每个聊天每秒消息数、网络错误重试次数
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_SEND_RETRIES = int(os.getenv('TELEGRAM_SEND_RETRIES', '3'))
+    
+    # 数据库配置：连接地址（异步驱动地址默认由DATABASE_URL推导，如 sqlite+aiosqlite、postgresql+asyncpg）
+    DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///twitter_monitor.db')
+    DATABASE_ASYNC_URL = os.getenv('DATABASE_ASYNC_URL', '')
+    # 连接池：常驻连接数、额外连接数、获取连接超时（秒）、连接回收时间（秒）
+    DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '5'))
+    DATABASE_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', '10'))
+    DATABASE_POOL_TIMEOUT = int(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+    DATABASE_POOL_RECYCLE = int(os.getenv('DATABASE_POOL_RECYCLE', '1800'))
\ No newline at end of file
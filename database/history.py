@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from database.models import Session, TwitterAccount, FetchedTweet, TweetSummary
+
+class TweetHistory:
+    """抓取历史：按推文ID保存抓取到的推文和生成的总结"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.account_ids = {}  # 小写用户名 -> 账号ID
+
+    def get_account_id(self, username: str, session=None) -> int:
+        """返回账号ID，不存在时创建"""
+        username = username.lower()
+        with self.lock:
+            account_id = self.account_ids.get(username)
+        if account_id is not None:
+            return account_id
+
+        own_session = session is None
+        session = session or Session()
+        try:
+            account = session.query(TwitterAccount).filter_by(username=username).first()
+            if account is None:
+                account = TwitterAccount(username=username, created_at=time.time())
+                session.add(account)
+                try:
+                    session.commit()
+                except IntegrityError:
+                    # 其他进程同时创建了该账号
+                    session.rollback()
+                    account = session.query(TwitterAccount).filter_by(username=username).one()
+            with self.lock:
+                self.account_ids[username] = account.id
+            return account.id
+        finally:
+            if own_session:
+                session.close()
+
+    async def get_account_id_async(self, username: str, session) -> int:
+        """异步会话版本的 get_account_id"""
+        username = username.lower()
+        with self.lock:
+            account_id = self.account_ids.get(username)
+        if account_id is not None:
+            return account_id
+
+        account = (await session.execute(
+            select(TwitterAccount).filter_by(username=username)
+        )).scalar_one_or_none()
+        if account is None:
+            account = TwitterAccount(username=username, created_at=time.time())
+            try:
+                # 使用保存点，账号已被其他进程创建时只回滚这一步
+                async with session.begin_nested():
+                    session.add(account)
+            except IntegrityError:
+                account = (await session.execute(
+                    select(TwitterAccount).filter_by(username=username)
+                )).scalar_one()
+        with self.lock:
+            self.account_ids[username] = account.id
+        return account.id
+
+    def save_tweets(self, username: str, tweets):
+        """保存新抓取的推文，已保存过的推文ID跳过"""
+        tweets = [tweet for tweet in tweets if tweet.get('id')]
+        if not tweets:
+            return
+        session = Session()
+        try:
+            account_id = self.get_account_id(username, session)
+            ids = [tweet['id'] for tweet in tweets]
+            existing = {
+                status_id for (status_id,) in
+                session.query(FetchedTweet.status_id).filter(FetchedTweet.status_id.in_(ids))
+            }
+            now = time.time()
+            for tweet in tweets:
+                if tweet['id'] in existing:
+                    continue
+                existing.add(tweet['id'])
+                session.add(FetchedTweet(
+                    status_id=tweet['id'],
+                    account_id=account_id,
+                    text=tweet['text'],
+                    time=tweet.get('time'),
+                    stats=json.dumps(tweet.get('stats') or {}),
+                    url=tweet.get('url'),
+                    pinned=bool(tweet.get('pinned')),
+                    fetched_at=now
+                ))
+            session.commit()
+        except IntegrityError:
+            # 并发写入了相同的推文，忽略
+            session.rollback()
+        finally:
+            session.close()
+
+    def save_summary(self, username: str, tweets, content: str):
+        """保存一次总结及其覆盖的推文ID范围"""
+        ids = sorted((int(tweet['id']) for tweet in tweets if tweet.get('id')))
+        first_id = str(ids[0]) if ids else None
+        last_id = str(ids[-1]) if ids else None
+        session = Session()
+        try:
+            account_id = self.get_account_id(username, session)
+            # 多个聊天订阅同一账号时，同一批推文的总结只保存一次
+            if last_id and session.query(TweetSummary.id).filter_by(
+                account_id=account_id, last_status_id=last_id, first_status_id=first_id
+            ).first():
+                return
+            session.add(TweetSummary(
+                account_id=account_id,
+                first_status_id=first_id,
+                last_status_id=last_id,
+                tweet_count=len(tweets),
+                content=content,
+                created_at=time.time()
+            ))
+            session.commit()
+        finally:
+            session.close()
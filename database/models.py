@@ -1,23 +1,220 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import time
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import Config
 
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql'
+}
+
+def get_async_url(url: str) -> str:
+    """由同步连接地址推导异步驱动的连接地址"""
+    if Config.DATABASE_ASYNC_URL:
+        return Config.DATABASE_ASYNC_URL
+    scheme, _, rest = url.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+')[0])
+    if driver is None:
+        raise ValueError(f"无法推导 {scheme} 的异步驱动，请设置 DATABASE_ASYNC_URL")
+    return f"{driver}://{rest}"
+
+def get_engine_options(url: str, is_async: bool = False):
+    """连接池参数；SQLite额外设置锁等待超时"""
+    options = {
+        'pool_size': Config.DATABASE_POOL_SIZE,
+        'max_overflow': Config.DATABASE_MAX_OVERFLOW,
+        'pool_timeout': Config.DATABASE_POOL_TIMEOUT,
+        'pool_recycle': Config.DATABASE_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+    if url.startswith('sqlite'):
+        options['connect_args'] = {'timeout': 30}
+        if is_async:
+            # aiosqlite 默认不使用连接池，显式指定以复用连接
+            options['poolclass'] = AsyncAdaptedQueuePool
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL模式允许读写并发，synchronous=NORMAL在WAL下足够安全且写入更快"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 Base = declarative_base()
-engine = create_engine(Config.DATABASE_URL)
+engine = create_engine(Config.DATABASE_URL, **get_engine_options(Config.DATABASE_URL))
 Session = sessionmaker(bind=engine)
 
+# 异步会话：在事件循环中访问数据库时使用，不阻塞事件循环
+async_engine = create_async_engine(get_async_url(Config.DATABASE_URL), **get_engine_options(Config.DATABASE_URL, True))
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+if engine.dialect.name == 'sqlite':
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, 'connect', set_sqlite_pragmas)
+
+class TwitterAccount(Base):
+    __tablename__ = 'twitter_accounts'
+    
+    id = Column(Integer, primary_key=True)
+    username = Column(String, unique=True, nullable=False)  # 小写用户名
+    created_at = Column(Float)  # Unix时间戳
+    
+    def __repr__(self):
+        return f"<TwitterAccount @{self.username}>"
+
 class ScheduledTask(Base):
+    """聊天对监控账号的订阅"""
     __tablename__ = 'scheduled_tasks'
+    __table_args__ = (
+        Index('ix_scheduled_tasks_chat_time', 'chat_id', 'schedule_time'),
+        Index('ix_scheduled_tasks_time', 'schedule_time'),
+        Index('ix_scheduled_tasks_account', 'account_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     chat_id = Column(Integer)  # Telegram聊天ID
-    twitter_username = Column(String)
+    account_id = Column(Integer, ForeignKey('twitter_accounts.id'))
+    twitter_username = Column(String)  # 用户输入的用户名（保留原始大小写用于展示）
     tweet_count = Column(Integer)
     schedule_time = Column(String)  # 格式：HH:MM
+    last_status_id = Column(String)  # 已推送的最新推文ID（增量抓取水位）
     
     def __repr__(self):
         return f"<Task {self.twitter_username} at {self.schedule_time}>"
 
+class NitterInstance(Base):
+    __tablename__ = 'nitter_instances'
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(String, unique=True, nullable=False)
+    latency = Column(Float)  # 滑动平均响应时间（秒）
+    success_rate = Column(Float, default=0.5)  # 滑动平均成功率
+    consecutive_failures = Column(Integer, default=0)
+    last_success_at = Column(Float)  # Unix时间戳
+    last_failure_at = Column(Float)  # Unix时间戳
+    circuit_open_until = Column(Float, default=0)  # 熔断截止时间
+    discovered_at = Column(Float)  # 最近一次出现在实例列表中的时间
+    
+    def __repr__(self):
+        return f"<NitterInstance {self.url} ok={self.success_rate:.2f}>"
+
+class SummaryCacheEntry(Base):
+    __tablename__ = 'summary_cache'
+    
+    key = Column(String, primary_key=True)  # 推文内容、模型和提示词版本的哈希
+    content = Column(String, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)  # Unix时间戳
+    
+    def __repr__(self):
+        return f"<SummaryCacheEntry {self.key[:12]}>"
+
+class QueuedJob(Base):
+    __tablename__ = 'job_queue'
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # task / digest
+    payload = Column(Text, nullable=False)  # JSON参数
+    status = Column(String, default='pending', index=True)  # pending / running / done / failed / delivered
+    result = Column(Text)  # JSON结果或错误信息
+    attempts = Column(Integer, default=0)
+    deliveries = Column(Integer, default=0)  # 结果发送失败的次数
+    worker = Column(String)  # 领取任务的worker标识
+    created_at = Column(Float, nullable=False)  # Unix时间戳
+    claimed_at = Column(Float)
+    finished_at = Column(Float)
+    
+    def __repr__(self):
+        return f"<QueuedJob {self.id} {self.kind} {self.status}>"
+
+class FetchedTweet(Base):
+    __tablename__ = 'fetched_tweets'
+    __table_args__ = (
+        Index('ix_fetched_tweets_account_status', 'account_id', 'status_id'),
+    )
+    
+    status_id = Column(String, primary_key=True)  # 推文ID
+    account_id = Column(Integer, ForeignKey('twitter_accounts.id'), nullable=False)
+    text = Column(Text)
+    time = Column(String)  # nitter显示的发布时间
+    stats = Column(Text)  # JSON统计数据
+    url = Column(String)
+    pinned = Column(Boolean, default=False)
+    fetched_at = Column(Float, nullable=False)  # Unix时间戳
+    
+    def __repr__(self):
+        return f"<FetchedTweet {self.status_id}>"
+
+class TweetSummary(Base):
+    __tablename__ = 'tweet_summaries'
+    __table_args__ = (
+        Index('ix_tweet_summaries_account_status', 'account_id', 'last_status_id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey('twitter_accounts.id'), nullable=False)
+    first_status_id = Column(String)  # 本次总结覆盖的最早推文ID
+    last_status_id = Column(String)  # 本次总结覆盖的最新推文ID
+    tweet_count = Column(Integer)
+    content = Column(Text, nullable=False)
+    created_at = Column(Float, nullable=False)  # Unix时间戳
+    
+    def __repr__(self):
+        return f"<TweetSummary {self.account_id} {self.first_status_id}-{self.last_status_id}>"
+
+def add_missing_columns():
+    """为已存在的表补充新增的列（create_all 不会修改已存在的表）"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def add_missing_indexes():
+    """为已存在的表补充新增的索引"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+
+def migrate_accounts():
+    """将旧任务表中的用户名迁移到账号表，并回填任务的account_id"""
+    with engine.begin() as conn:
+        usernames = conn.execute(text(
+            "SELECT DISTINCT lower(twitter_username) FROM scheduled_tasks "
+            "WHERE account_id IS NULL AND twitter_username IS NOT NULL"
+        )).scalars().all()
+        if not usernames:
+            return
+        existing = set(conn.execute(text("SELECT username FROM twitter_accounts")).scalars())
+        new_accounts = [
+            {'username': username, 'created_at': time.time()}
+            for username in usernames if username not in existing
+        ]
+        if new_accounts:
+            conn.execute(TwitterAccount.__table__.insert(), new_accounts)
+        conn.execute(text(
+            "UPDATE scheduled_tasks SET account_id = ("
+            "SELECT id FROM twitter_accounts WHERE twitter_accounts.username = lower(scheduled_tasks.twitter_username)"
+            ") WHERE account_id IS NULL"
+        ))
+
 # 创建所有表
-Base.metadata.create_all(engine) 
\ No newline at end of file
+Base.metadata.create_all(engine)
+add_missing_columns()
+add_missing_indexes()
+migrate_accounts() 
\ No newline at end of file
@@ -0,0 +1,123 @@
+import json
+import time
+from sqlalchemy import update
+from database.models import Session, QueuedJob
+from config import Config
+
+class JobQueue:
+    """基于SQLite的持久化任务队列：bot进程入队，worker进程领取执行并写回结果"""
+
+    def enqueue(self, kind: str, payload: dict) -> int:
+        """加入一个待执行的任务，返回任务ID"""
+        session = Session()
+        try:
+            job = QueuedJob(kind=kind, payload=json.dumps(payload, ensure_ascii=False), created_at=time.time())
+            session.add(job)
+            session.commit()
+            return job.id
+        finally:
+            session.close()
+
+    def claim(self, worker: str):
+        """领取一个待执行的任务；超时未完成的任务（worker已退出）会被重新领取"""
+        now = time.time()
+        session = Session()
+        try:
+            # 多次超时仍未完成的任务不再重试
+            session.execute(
+                update(QueuedJob)
+                .where(QueuedJob.status == 'running')
+                .where(QueuedJob.claimed_at < now - Config.WORKER_JOB_TIMEOUT)
+                .where(QueuedJob.attempts >= Config.WORKER_MAX_ATTEMPTS)
+                .values(status='failed', finished_at=now)
+            )
+            session.commit()
+            candidates = session.query(QueuedJob.id).filter(
+                (QueuedJob.status == 'pending') |
+                ((QueuedJob.status == 'running') & (QueuedJob.claimed_at < now - Config.WORKER_JOB_TIMEOUT))
+            ).order_by(QueuedJob.id).limit(10).all()
+            for (job_id,) in candidates:
+                # 条件更新保证多个worker同时领取时只有一个成功
+                claimed = session.execute(
+                    update(QueuedJob)
+                    .where(QueuedJob.id == job_id)
+                    .where(
+                        (QueuedJob.status == 'pending') |
+                        ((QueuedJob.status == 'running') & (QueuedJob.claimed_at < now - Config.WORKER_JOB_TIMEOUT))
+                    )
+                    .values(status='running', worker=worker, claimed_at=now, attempts=QueuedJob.attempts + 1)
+                ).rowcount
+                session.commit()
+                if claimed:
+                    job = session.get(QueuedJob, job_id)
+                    return job.id, job.kind, json.loads(job.payload), job.attempts
+            return None
+        finally:
+            session.close()
+
+    def complete(self, job_id: int, result: dict):
+        """写回任务结果，等待bot进程发送"""
+        self._finish(job_id, 'done', json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: int, error: str, attempts: int):
+        """任务执行失败：未超过最大次数时放回队列重试"""
+        status = 'pending' if attempts < Config.WORKER_MAX_ATTEMPTS else 'failed'
+        self._finish(job_id, status, error)
+
+    def _finish(self, job_id: int, status: str, result: str):
+        session = Session()
+        try:
+            session.execute(
+                update(QueuedJob)
+                .where(QueuedJob.id == job_id)
+                .values(status=status, result=result, finished_at=time.time())
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    def take_results(self, limit: int = 50):
+        """取出已完成、待发送的任务结果，同时清理过期的记录；发送成功后需调用 ack_result"""
+        session = Session()
+        try:
+            jobs = session.query(QueuedJob).filter_by(status='done').order_by(QueuedJob.id).limit(limit).all()
+            results = [(job.id, json.loads(job.result)) for job in jobs]
+            session.query(QueuedJob).filter(
+                QueuedJob.status.in_(['delivered', 'failed']),
+                QueuedJob.finished_at < time.time() - 86400
+            ).delete(synchronize_session=False)
+            session.commit()
+            return results
+        finally:
+            session.close()
+
+    def retry_result(self, job_id: int, error: str) -> bool:
+        """结果发送失败：未超过最大次数时保留等待下次发送，否则标记为失败；返回是否还会重试"""
+        session = Session()
+        try:
+            job = session.get(QueuedJob, job_id)
+            if job is None or job.status != 'done':
+                return False
+            job.deliveries = (job.deliveries or 0) + 1
+            if job.deliveries >= Config.WORKER_MAX_ATTEMPTS:
+                job.status = 'failed'
+                job.result = error
+                job.finished_at = time.time()
+            session.commit()
+            return job.status == 'done'
+        finally:
+            session.close()
+
+    def ack_result(self, job_id: int):
+        """结果已发送，标记为已送达；未确认的结果下次仍会取出重新发送"""
+        session = Session()
+        try:
+            session.execute(
+                update(QueuedJob)
+                .where(QueuedJob.id == job_id)
+                .where(QueuedJob.status == 'done')
+                .values(status='delivered')
+            )
+            session.commit()
+        finally:
+            session.close()
@@ -5,6 +5,7 @@ from telegram import Update
 from telegram_bot.handlers import *
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler
 from telegram_bot.scheduler import TaskScheduler
+from telegram_bot.sender import MessageSender
 
 class Config:
     # 加载.env文件
@@ -27,8 +28,14 @@ async def cancel(update, context):
 
 def run_bot():
     """运行机器人的主函数"""
+    # 设置调度器
+    scheduler = TaskScheduler()
+    
+    async def shutdown(_):
+        await scheduler.shutdown()
+    
     # 创建应用
-    application = Application.builder().token(Config.TELEGRAM_TOKEN).build()
+    application = Application.builder().token(Config.TELEGRAM_TOKEN).post_shutdown(shutdown).build()
     
     # 注册处理程序
     application.add_handler(CommandHandler("start", start))
@@ -47,9 +54,8 @@ def run_bot():
     )
     application.add_handler(conv_handler)
     
-    # 设置调度器
-    scheduler = TaskScheduler()
     scheduler.bot = application.bot
+    scheduler.sender = MessageSender(application.bot)
     init_scheduler(scheduler)
     
     # 启动调度器
@@ -7,7 +7,10 @@ from telegram.ext import (
     ContextTypes
 )
 import re
+import asyncio
+from telegram.error import BadRequest, RetryAfter
 from telegram_bot.scheduler import TaskScheduler
+from config import Config
 
 # 定义对话状态
 SET_USER, SET_COUNT, SET_TIME = range(3)
@@ -29,6 +32,61 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/list_tasks - 查看所有任务"
     )
 
+def split_paragraphs(text: str, limit: int = 4000):
+    """按段落将长文本拆分为不超过limit的多段"""
+    if len(text) <= limit:
+        return [text]
+    paragraphs = text.split('\n\n')
+    parts = []
+    current = paragraphs[0]  # 保留标题
+    for paragraph in paragraphs[1:]:
+        if len(current + "\n\n" + paragraph) > limit:
+            parts.append(current)
+            current = paragraph
+        else:
+            current += "\n\n" + paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+async def edit_text_safely(message, text: str):
+    """编辑消息文本，忽略内容未变化的错误；遇到限流时返回需要等待的秒数"""
+    try:
+        await message.edit_text(text)
+    except RetryAfter as e:
+        return e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+    except BadRequest as e:
+        if 'not modified' not in str(e).lower():
+            raise
+    return 0
+
+async def finish_edit(message, text: str) -> bool:
+    """写入最终内容：遇到限流时按要求等待后重试，仍失败返回False"""
+    for _ in range(Config.TELEGRAM_SEND_RETRIES + 1):
+        wait = await edit_text_safely(message, text)
+        if not wait:
+            return True
+        await asyncio.sleep(wait)
+    return False
+
+async def stream_to_message(message, chunks, prefix: str = ""):
+    """消费流式总结，按Telegram编辑频率限制节流地更新消息，返回最终文本"""
+    loop = asyncio.get_running_loop()
+    next_edit = loop.time() + Config.STREAM_EDIT_INTERVAL
+    shown = None
+    text = ""
+    async for text in chunks:
+        now = loop.time()
+        if now < next_edit:
+            continue
+        # 生成过程中只显示前4000个字符，完整内容在结束后分段发送
+        preview = (prefix + text)[:4000]
+        if preview != shown:
+            wait = await edit_text_safely(message, preview + " ▌")
+            shown = preview
+            next_edit = now + max(Config.STREAM_EDIT_INTERVAL, wait)
+    return text
+
 async def get_tweets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args
     if len(args) != 2:
@@ -38,17 +96,25 @@ async def get_tweets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     username = args[0]
     try:
         count = int(args[1])
-        if count > 20:
-            await update.message.reply_text("ℹ️ 温馨提示：由于API限制，最多获取21条推文")
+        max_count = Config.NITTER_MAX_PAGES * 20
+        if count < 1:
+            await update.message.reply_text("数量必须大于0")
+            return
+        if count > max_count:
+            await update.message.reply_text(f"ℹ️ 温馨提示：最多获取{max_count}条推文")
+            count = max_count
     except ValueError:
         await update.message.reply_text("数量必须是一个有效的数字")
         return
     
-    await update.message.reply_text(f"正在获取 @{username} 的最新推文...")
+    chat_id = update.effective_chat.id
+    send = scheduler.sender.send
+    await send(chat_id, f"正在获取 @{username} 的最新推文...")
     
     try:
         # 获取推文
-        tweets = scheduler.twitter_client.get_recent_tweets(username, count)
+        # 交互请求可以先返回稍旧的缓存结果，后台刷新
+        tweets = await scheduler.twitter_client.get_recent_tweets_async(username, count, allow_stale=True)
         if tweets:
             # 发送简要信息
             brief_info = f"✅ 已获取 @{username} 的 {len(tweets)} 条推文\n"
@@ -60,42 +126,39 @@ async def get_tweets(update: Update, context: ContextTypes.DEFAULT_TYPE):
             brief_info += f"❤️ 总点赞：{total_likes}\n"
             brief_info += f"🔄 总转发：{total_retweets}\n"
             
-            await update.message.reply_text(brief_info)
+            await send(chat_id, brief_info)
             
             # AI总结
-            await update.message.reply_text("🤖 正在生成AI总结...")
-            summary = scheduler.ai_summarizer.summarize_tweets(tweets)
+            # 占位消息之后会被编辑，不能与其他消息合并
+            placeholder = await send(chat_id, "🤖 正在生成AI总结...", merge=False)
+            if Config.STREAM_SUMMARIES:
+                # 流式模式：边生成边更新占位消息
+                summary = await stream_to_message(
+                    placeholder,
+                    scheduler.ai_summarizer.summarize_tweets_stream(tweets),
+                    "📋 AI总结要点：\n\n"
+                )
+            else:
+                summary = await scheduler.ai_summarizer.summarize_tweets_async(tweets)
             
             # 发送总结
             summary_message = "📋 AI总结要点：\n\n" + summary
             
-            # 如果总结太长，分段发送
-            if len(summary_message) > 4000:
-                # 按段落分割
-                paragraphs = summary_message.split('\n\n')
-                current_summary = paragraphs[0]  # 保留标题
-                
-                for paragraph in paragraphs[1:]:
-                    if len(current_summary + "\n\n" + paragraph) > 4000:
-                        await update.message.reply_text(current_summary)
-                        current_summary = paragraph
-                    else:
-                        current_summary += "\n\n" + paragraph
-                
-                if current_summary:
-                    await update.message.reply_text(current_summary)
-            else:
-                await update.message.reply_text(summary_message)
-            
-            # 提供查看完整内容的选项
-            await update.message.reply_text(
+            # 如果总结太长，按段落分段发送
+            parts = split_paragraphs(summary_message)
+            if Config.STREAM_SUMMARIES and await finish_edit(placeholder, parts[0]):
+                # 第一段写入占位消息，其余段落另行发送；编辑失败时第一段也另行发送
+                parts = parts[1:]
+            # 提供查看完整内容的选项；与剩余段落一起入队，发送队列会合并短消息
+            parts.append(
                 "💡 提示：如需查看完整推文内容，请访问：\n"
                 f"https://twitter.com/{username}"
             )
+            await asyncio.gather(*[send(chat_id, part) for part in parts])
         else:
-            await update.message.reply_text(f"❌ 未能找到 @{username} 的推文，请检查用户名是否正确或稍后重试")
+            await send(chat_id, f"❌ 未能找到 @{username} 的推文，请检查用户名是否正确或稍后重试")
     except Exception as e:
-        await update.message.reply_text(f"❌ 获取推文时发生错误：{str(e)}")
+        await send(chat_id, f"❌ 获取推文时发生错误：{str(e)}")
 
 async def schedule_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("请输入要监控的Twitter用户名：")
@@ -125,7 +188,7 @@ async def receive_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
         
         # 添加定时任务
-        if scheduler.add_task(chat_id, username, count, time):
+        if await scheduler.add_task(chat_id, username, count, time):
             await update.message.reply_text(
                 f"定时任务已设置！\n"
                 f"将在每天 {time} 获取 @{username} 的 {count} 条推文"
@@ -145,7 +208,7 @@ async def receive_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def list_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """列出所有定时任务"""
     chat_id = update.effective_chat.id
-    tasks = scheduler.get_tasks(chat_id)
+    tasks = await scheduler.get_tasks(chat_id)
     
     if not tasks:
         await update.message.reply_text("当前没有定时任务")
@@ -0,0 +1,63 @@
+import asyncio
+import heapq
+import itertools
+import time
+import zlib
+from apscheduler.triggers.cron import CronTrigger
+from utils.ratelimit import TokenBucket
+from config import Config
+
+class StartPlanner:
+    """错峰调度：为每个任务计算固定的启动偏移，并按截止时间先后限制每秒启动的抓取任务数"""
+
+    def __init__(self):
+        self.window = max(0, int(Config.SCHEDULE_SPREAD_WINDOW))
+        # 截止时间至少覆盖错峰窗口，避免偏移后的任务一启动就已超时
+        self.deadline = max(Config.SCHEDULE_DEADLINE, self.window)
+        self.bucket = TokenBucket(Config.SCHEDULE_MAX_STARTS, 1) if Config.SCHEDULE_MAX_STARTS > 0 else None
+        self.waiting = []  # 堆：(截止时间, 序号, future)
+        self.counter = itertools.count()
+        self.dispatcher = None
+
+    def offset(self, key) -> int:
+        """按任务键计算固定的偏移秒数，同一任务每次重启后偏移不变"""
+        if not self.window:
+            return 0
+        return zlib.crc32(str(key).encode()) % self.window
+
+    def trigger(self, key, schedule_time: str, lead: int = 0):
+        """在用户选择的时间上加上偏移，生成每日触发器；lead为提前的秒数（用于预取）"""
+        hour, minute = map(int, schedule_time.split(':'))
+        total = (hour * 3600 + minute * 60 + self.offset(key) - lead) % 86400
+        return CronTrigger(hour=total // 3600, minute=total % 3600 // 60, second=total % 60)
+
+    def deadline_for(self, key) -> float:
+        """任务最晚的启动时间：用户选择的时间加上截止宽限"""
+        return time.time() - self.offset(key) + self.deadline
+
+    async def admit(self, deadline: float):
+        """等待启动名额；截止时间早的任务先放行，已到截止时间的任务不再等待"""
+        if self.bucket is None:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (deadline, next(self.counter), future))
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def _release(self):
+        _, _, future = heapq.heappop(self.waiting)
+        if not future.done():
+            future.set_result(None)
+
+    async def _dispatch(self):
+        while self.waiting:
+            now = time.time()
+            if self.waiting[0][0] <= now:
+                # 已到截止时间：不占用名额直接放行，保证消息不会拖得太晚
+                self._release()
+                continue
+            if self.bucket.try_acquire():
+                self._release()
+                continue
+            await asyncio.sleep(min(self.bucket.delay(), self.waiting[0][0] - now))
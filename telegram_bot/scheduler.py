@@ -1,104 +1,556 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from database.models import Session, ScheduledTask
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select
+from telegram.error import TelegramError, BadRequest, RetryAfter, TimedOut, NetworkError
+import asyncio
+import pickle
+import time
+from database.models import AsyncSession, ScheduledTask, engine, async_engine
+from database.queue import JobQueue
+from database.history import TweetHistory
 from twitter.client import TwitterClient
-from ai_summarizer.processor import AISummarizer
+from ai_summarizer.processor import AISummarizer, ERROR_PREFIX
+from utils.singleflight import SingleFlight
+from telegram_bot.planner import StartPlanner
+from config import Config
+
+# 持久化的任务只能保存模块级函数的引用，由这些函数转发给当前运行的调度器
+active_scheduler = None
+
+async def run_scheduled_task(*args):
+    await active_scheduler.execute_task(*args)
+
+async def run_prefetch_task(*args):
+    await active_scheduler.prefetch_task(*args)
 
 class TaskScheduler:
     def __init__(self):
-        self.scheduler = AsyncIOScheduler(timezone="Asia/Shanghai")  # 设置时区
+        # 定时任务持久化到数据库，重启后按misfire_grace_time补执行错过的任务；维护类任务只保存在内存中
+        self.jobstore = SQLAlchemyJobStore(engine=engine)
+        self.scheduler = AsyncIOScheduler(
+            timezone="Asia/Shanghai",  # 设置时区
+            jobstores={'default': self.jobstore, 'memory': MemoryJobStore()},
+            job_defaults={
+                'misfire_grace_time': Config.SCHEDULE_MISFIRE_GRACE,
+                'coalesce': True  # 停机期间错过多次只补执行一次
+            }
+        )
         self.twitter_client = TwitterClient()
         self.ai_summarizer = AISummarizer()
         self.bot = None
+        self.sender = None  # 统一的消息发送队列，见 telegram_bot.sender
+        # 多个聊天订阅同一账号时，合并相同的抓取和总结请求
+        self.fetch_flight = SingleFlight(Config.COALESCE_TTL)
+        self.summary_flight = SingleFlight(Config.COALESCE_TTL)
+        # 合并摘要模式下，同一聊天同一时间点待处理的任务
+        self.pending_digests = {}
+        # 上次输出总结缓存统计时的查询次数
+        self.logged_lookups = 0
+        # 错峰调度：同一时间点的任务分散启动
+        self.planner = StartPlanner()
+        # 预取结果：task_id -> {'tweets', 'summary', 'at'}，在发送时间直接使用
+        self.ready = {}
+        # worker模式：抓取和总结交给worker进程执行，本进程只负责入队和发送结果
+        self.job_queue = JobQueue() if Config.WORKER_MODE else None
+        # 按推文ID记录抓取到的推文和生成的总结
+        self.history = TweetHistory()
         
-    async def execute_task(self, chat_id: int, username: str, count: int):
-        """执行单个任务"""
+    async def get_watermark(self, task_id):
+        """读取任务已推送的最新推文ID"""
+        if task_id is None:
+            return None
+        async with AsyncSession() as session:
+            task = await session.get(ScheduledTask, task_id)
+            return task.last_status_id if task else None
+    
+    async def update_watermark(self, task_id, tweets):
+        """推送成功后将水位推进到本次最新的推文ID"""
+        ids = [int(tweet['id']) for tweet in tweets if tweet.get('id')]
+        if task_id is None or not ids:
+            return
+        async with AsyncSession() as session:
+            task = await session.get(ScheduledTask, task_id)
+            if task:
+                task.last_status_id = str(max(ids))
+                await session.commit()
+    
+    async def fetch_shared(self, username: str, count: int, since_id=None):
+        """抓取比水位更新的推文，同一账号、数量和水位的并发请求只抓取一次"""
+        key = (username.lower(), count, since_id)
+        return await self.fetch_flight.do(
+            key,
+            lambda: self.fetch_and_record(username, count, since_id),
+            should_cache=bool
+        )
+    
+    async def fetch_and_record(self, username: str, count: int, since_id=None):
+        """抓取推文并保存到抓取历史；翻页到水位为止"""
+        tweets = await self.twitter_client.get_recent_tweets_async(username, count, since_id)
+        await self.record_tweets(username, tweets)
+        return tweets
+    
+    async def record_tweets(self, username: str, tweets):
+        """保存抓取到的推文到抓取历史"""
+        if not tweets:
+            return
         try:
-            # 获取推文
-            tweets = self.twitter_client.get_recent_tweets(username, count)
-            if tweets:
-                # AI总结
-                summary = self.ai_summarizer.summarize_tweets(tweets)
-                # 发送结果（需要通过bot发送）
-                await self.bot.send_message(chat_id, summary)
+            await asyncio.to_thread(self.history.save_tweets, username, tweets)
+        except Exception as e:
+            print(f"Failed to record tweets for @{username}: {str(e)}")
+    
+    async def record_summary(self, username: str, tweets, summary: str):
+        """保存总结到抓取历史，失败的总结不保存"""
+        if summary.startswith(ERROR_PREFIX):
+            return
+        try:
+            await asyncio.to_thread(self.history.save_summary, username, tweets, summary)
+        except Exception as e:
+            print(f"Failed to record summary for @{username}: {str(e)}")
+    
+    async def summarize_shared(self, tweets):
+        """总结推文，相同推文集合的并发请求只调用一次AI"""
+        key = tuple(tweet.get('id') or tweet['text'] for tweet in tweets)
+        return await self.summary_flight.do(
+            key,
+            lambda: self.ai_summarizer.summarize_tweets_async(tweets),
+            should_cache=lambda summary: not summary.startswith(ERROR_PREFIX)
+        )
+    
+    async def fetch_new_tweets(self, task_id, username: str, count: int):
+        """获取本任务水位之后的推文（与订阅同一账号、水位相同的其他任务共享）"""
+        since_id = await self.get_watermark(task_id)
+        tweets = await self.fetch_shared(username, count, since_id)
+        return self.twitter_client.filter_newer(tweets, since_id)
+    
+    def spread_key(self, chat_id: int, task_id: int, schedule_time: str):
+        """错峰偏移的键；合并摘要模式下同一聊天同一时间点的任务使用相同偏移，保证仍能合并"""
+        if Config.DIGEST_MODE != 'off':
+            return f"{chat_id}:{schedule_time}"
+        return task_id
+    
+    async def prefetch_task(self, chat_id: int, username: str, count: int, task_id: int, schedule_time: str):
+        """在发送时间之前抓取并总结，结果放入就绪队列"""
+        try:
+            await self.planner.admit(time.time() + Config.PREFETCH_LEAD)
+            tweets = await self.fetch_new_tweets(task_id, username, count)
+            summary = None
+            if tweets and Config.DIGEST_MODE == 'off':
+                summary = await self.summarize_shared(tweets)
+                if summary.startswith(ERROR_PREFIX):
+                    summary = None
+            self.ready[task_id] = {'tweets': tweets, 'summary': summary, 'at': time.time()}
+        except Exception as e:
+            print(f"Prefetch failed for @{username}: {str(e)}")
+    
+    def take_prefetched(self, task_id):
+        """取出预取结果；结果缺失、过期或预取时没有新推文则返回None，改为按时抓取"""
+        entry = self.ready.pop(task_id, None)
+        if entry is None or not entry['tweets']:
+            return None
+        if time.time() - entry['at'] > Config.PREFETCH_MAX_AGE:
+            return None
+        return entry
+    
+    async def fetch_many_new_tweets(self, entries):
+        """获取一组任务的新推文：预取过的直接使用，其余账号一次批量并发抓取，再按各任务的水位过滤
+
+        同一账号的多个任务按其中最旧的水位抓取，翻页到该水位为止
+        """
+        results = {}
+        counts = {}
+        since_ids = {}
+        watermarks = {}
+        pending = []
+        for task_id, username, count in entries:
+            entry = self.take_prefetched(task_id)
+            if entry is not None:
+                results[task_id] = entry['tweets']
+                continue
+            pending.append((task_id, username, count))
+            key = username.lower()
+            counts[key] = max(counts.get(key, 0), count)
+            watermarks[task_id] = await self.get_watermark(task_id)
+            # 任一任务还没有水位时不按水位截止
+            if key not in since_ids:
+                since_ids[key] = watermarks[task_id]
+            elif since_ids[key] is not None:
+                since_ids[key] = None if watermarks[task_id] is None else \
+                    min(since_ids[key], watermarks[task_id], key=int)
+
+        fetched = {}
+        async for username, tweets in self.twitter_client.get_many(list(counts), counts=counts, since_ids=since_ids):
+            fetched[username] = tweets
+            await self.record_tweets(username, tweets)
+
+        for task_id, username, count in pending:
+            tweets = fetched.get(username.lower(), [])[:count]
+            results[task_id] = self.twitter_client.filter_newer(tweets, watermarks[task_id])
+        return results
+    
+    async def execute_task(self, chat_id: int, username: str, count: int, task_id: int = None, schedule_time: str = None):
+        """执行单个任务，只处理上次推送之后的新推文"""
+        deadline = self.planner.deadline_for(self.spread_key(chat_id, task_id, schedule_time))
+        if Config.DIGEST_MODE != 'off' and task_id is not None:
+            await self.enqueue_digest(chat_id, schedule_time, (task_id, username, count), deadline)
+            return
+        if self.job_queue is not None:
+            await asyncio.to_thread(self.job_queue.enqueue, 'task', {
+                'chat_id': chat_id, 'username': username, 'count': count, 'task_id': task_id
+            })
+            return
+        try:
+            entry = self.take_prefetched(task_id)
+            if entry is not None:
+                messages, task_tweets = await self.build_task_messages(
+                    task_id, username, count, entry['tweets'], entry['summary']
+                )
+            else:
+                await self.planner.admit(deadline)
+                messages, task_tweets = await self.build_task_messages(task_id, username, count)
+            await self.deliver(chat_id, messages, task_tweets)
         except Exception as e:
             print(f"Task execution failed: {str(e)}")
     
-    def add_task(self, chat_id: int, username: str, count: int, time: str):
+    async def build_task_messages(self, task_id, username: str, count: int, tweets=None, summary=None):
+        """抓取并总结单个任务（可传入预取的结果），返回待发送的消息和需要推进水位的推文"""
+        if tweets is None:
+            tweets = await self.fetch_new_tweets(task_id, username, count)
+        if not tweets:
+            print(f"No new tweets for @{username}, skipping task")
+            return [], []
+        if summary is None:
+            summary = await self.summarize_shared(tweets)
+        if summary.startswith(ERROR_PREFIX):
+            # 总结失败时不发送错误信息，也不推进水位，下次执行时重新处理这些推文
+            print(f"Summary failed for @{username}: {summary}")
+            return [], []
+        await self.record_summary(username, tweets, summary)
+        return [summary], [(task_id, tweets)]
+    
+    async def deliver(self, chat_id: int, messages, task_tweets):
+        """经发送队列发送消息，全部发送成功后推进水位"""
+        await asyncio.gather(*[self.sender.send(chat_id, message) for message in messages])
+        for task_id, tweets in task_tweets:
+            await self.update_watermark(task_id, tweets)
+    
+    async def enqueue_digest(self, chat_id: int, schedule_time: str, entry, deadline: float):
+        """收集同一聊天同一时间点的任务，等待片刻后合并为一次AI请求"""
+        key = (chat_id, schedule_time)
+        group = self.pending_digests.get(key)
+        if group is not None:
+            group.append(entry)
+            return
+
+        # 第一个到达的任务负责等待收集窗口结束并执行整组任务
+        self.pending_digests[key] = [entry]
+        await asyncio.sleep(Config.DIGEST_WINDOW)
+        entries = self.pending_digests.pop(key)
+        if self.job_queue is not None:
+            await asyncio.to_thread(self.job_queue.enqueue, 'digest', {'chat_id': chat_id, 'entries': entries})
+            return
+        await self.planner.admit(deadline)
+        await self.execute_digest(chat_id, entries)
+    
+    async def execute_digest(self, chat_id: int, entries):
+        """执行一组任务并发送合并摘要"""
+        try:
+            messages, task_tweets = await self.build_digest_messages(chat_id, entries)
+            await self.deliver(chat_id, messages, task_tweets)
+        except Exception as e:
+            print(f"Digest execution failed: {str(e)}")
+    
+    async def build_digest_messages(self, chat_id: int, entries):
+        """并发抓取各账号的新推文，一次请求生成各账号的总结，返回待发送的消息和需要推进水位的推文"""
+        results = await self.fetch_many_new_tweets(entries)
+        accounts = {}
+        for task_id, username, count in entries:
+            tweets = results.get(task_id)
+            if tweets:
+                accounts.setdefault(username, tweets)
+        if not accounts:
+            print(f"No new tweets for chat {chat_id}, skipping digest")
+            return [], []
+
+        summaries = await self.ai_summarizer.summarize_batch_async(accounts)
+        # 总结失败的账号不发送、不推进水位，下次执行时重新处理
+        for username, summary in list(summaries.items()):
+            if summary.startswith(ERROR_PREFIX):
+                print(f"Summary failed for @{username}: {summary}")
+                del summaries[username]
+                continue
+            await self.record_summary(username, accounts[username], summary)
+        task_tweets = [
+            (task_id, results[task_id]) for task_id, username, count in entries
+            if username in summaries and results.get(task_id)
+        ]
+        if Config.DIGEST_MODE == 'split':
+            messages = list(summaries.values())
+        else:
+            sections = [f"👤 @{username}\n\n{summary.strip()}" for username, summary in summaries.items()]
+            messages = self.pack_messages(sections)
+        return messages, task_tweets
+    
+    async def run_job(self, kind: str, payload):
+        """worker进程执行队列中的任务，返回可序列化的结果，由bot进程发送"""
+        if kind == 'digest':
+            entries = [tuple(entry) for entry in payload['entries']]
+            messages, task_tweets = await self.build_digest_messages(payload['chat_id'], entries)
+        else:
+            messages, task_tweets = await self.build_task_messages(
+                payload['task_id'], payload['username'], payload['count']
+            )
+        return {
+            'chat_id': payload['chat_id'],
+            'messages': messages,
+            # 只需推文ID即可推进水位
+            'watermarks': [
+                [task_id, [tweet['id'] for tweet in tweets if tweet.get('id')]]
+                for task_id, tweets in task_tweets
+            ]
+        }
+    
+    @staticmethod
+    def is_permanent_error(error) -> bool:
+        """发送错误是否无法通过重试恢复：限流、超时和网络错误之外的Telegram错误"""
+        if isinstance(error, BadRequest):
+            return True
+        if isinstance(error, (RetryAfter, TimedOut, NetworkError)):
+            return False
+        return isinstance(error, TelegramError)
+    
+    async def deliver_results(self):
+        """bot进程定期取出worker完成的结果并发送"""
+        try:
+            results = await asyncio.to_thread(self.job_queue.take_results)
+            for job_id, result in results:
+                task_tweets = [
+                    (task_id, [{'id': tweet_id} for tweet_id in ids])
+                    for task_id, ids in result['watermarks']
+                ]
+                try:
+                    await self.deliver(result['chat_id'], result['messages'], task_tweets)
+                except Exception as e:
+                    if self.is_permanent_error(e):
+                        # 聊天不存在、机器人被屏蔽或移出群组等，重试也不会成功
+                        print(f"Failed to deliver job {job_id}, giving up: {str(e)}")
+                        await asyncio.to_thread(self.job_queue.fail, job_id, str(e), Config.WORKER_MAX_ATTEMPTS)
+                    elif await asyncio.to_thread(self.job_queue.retry_result, job_id, str(e)):
+                        # 未确认的结果保留，下次轮询时重新发送
+                        print(f"Failed to deliver job {job_id}, will retry: {str(e)}")
+                    else:
+                        print(f"Failed to deliver job {job_id} after {Config.WORKER_MAX_ATTEMPTS} attempts: {str(e)}")
+                    continue
+                await asyncio.to_thread(self.job_queue.ack_result, job_id)
+        except Exception as e:
+            print(f"Result delivery failed: {str(e)}")
+    
+    def pack_messages(self, sections, limit: int = 4000):
+        """将多个小节合并为尽量少的消息，每条不超过Telegram长度限制"""
+        messages = []
+        current = ""
+        for section in sections:
+            if current and len(current) + len(section) + 2 > limit:
+                messages.append(current)
+                current = ""
+            current = current + "\n\n" + section if current else section
+        if current:
+            messages.append(current)
+        return messages
+    
+    async def maintain_instances(self):
+        """后台维护nitter实例注册表：按TTL刷新实例列表并持久化健康状况，同时输出总结缓存命中统计"""
+        try:
+            await asyncio.to_thread(self.twitter_client.refresh_instances)
+        except Exception as e:
+            print(f"Instance registry maintenance failed: {str(e)}")
+        self.log_cache_stats()
+    
+    def log_cache_stats(self):
+        """输出AI总结缓存的命中统计，自上次输出后没有新的查询时不输出"""
+        stats = self.ai_summarizer.cache.stats()
+        lookups = stats['hits'] + stats['db_hits'] + stats['misses']
+        if lookups == self.logged_lookups:
+            return
+        self.logged_lookups = lookups
+        print(
+            f"Summary cache: {stats['hits']} memory hits, {stats['db_hits']} db hits, "
+            f"{stats['misses']} misses, hit rate {stats['hit_rate']:.1%}, {stats['memory_entries']} entries in memory"
+        )
+    
+    async def shutdown(self):
+        """退出前关闭连接并保存实例健康状况"""
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        await self.twitter_client.aclose()
+        await asyncio.to_thread(self.twitter_client.instance_registry.flush)
+        await async_engine.dispose()
+    
+    def job_ids(self, task_id: int):
+        """任务对应的调度任务ID"""
+        # worker模式下由worker进程并行处理，不在本进程预取
+        if Config.PREFETCH_LEAD > 0 and self.job_queue is None:
+            return [f"task_{task_id}", f"prefetch_{task_id}"]
+        return [f"task_{task_id}"]
+    
+    def job_specs(self, chat_id: int, task_id: int, schedule_time: str):
+        """任务应注册的调度任务：job_id -> (函数, 触发器)，预取任务提前PREFETCH_LEAD秒"""
+        key = self.spread_key(chat_id, task_id, schedule_time)
+        jobs = {
+            f"task_{task_id}": (run_scheduled_task, self.planner.trigger(key, schedule_time)),
+            f"prefetch_{task_id}": (run_prefetch_task, self.planner.trigger(key, schedule_time, Config.PREFETCH_LEAD))
+        }
+        return {job_id: jobs[job_id] for job_id in self.job_ids(task_id)}
+    
+    def add_jobs(self, chat_id: int, username: str, count: int, task_id: int, schedule_time: str, missing=None):
+        """注册任务的发送任务和预取任务；missing 指定时只注册其中的任务"""
+        args = [chat_id, username, count, task_id, schedule_time]
+        for job_id, (func, trigger) in self.job_specs(chat_id, task_id, schedule_time).items():
+            if missing is not None and job_id not in missing:
+                continue
+            self.scheduler.add_job(func, trigger, args=args, id=job_id, replace_existing=True)
+    
+    async def add_task(self, chat_id: int, username: str, count: int, time: str):
         """添加新任务"""
         try:
             # 保存到数据库
-            session = Session()
-            task = ScheduledTask(
-                chat_id=chat_id,
-                twitter_username=username,
-                tweet_count=count,
-                schedule_time=time
-            )
-            session.add(task)
-            session.commit()
+            async with AsyncSession() as session:
+                task = ScheduledTask(
+                    chat_id=chat_id,
+                    account_id=await self.history.get_account_id_async(username, session),
+                    twitter_username=username,
+                    tweet_count=count,
+                    schedule_time=time
+                )
+                session.add(task)
+                await session.commit()
             
-            # 添加到调度器
-            hour, minute = map(int, time.split(':'))
-            self.scheduler.add_job(
-                self.execute_task,
-                CronTrigger(hour=hour, minute=minute),
-                args=[chat_id, username, count],
-                id=f"task_{task.id}"
-            )
+            # 添加到调度器（按错峰偏移触发；任务存储写数据库，放到线程中执行）
+            await asyncio.to_thread(self.add_jobs, chat_id, username, count, task.id, time)
             return True
         except Exception as e:
             print(f"Failed to add task: {str(e)}")
             return False
-        finally:
-            session.close()
     
-    def remove_task(self, task_id: int):
+    def remove_jobs(self, task_id: int):
+        """从调度器中移除任务的发送和预取任务"""
+        for job_id in (f"task_{task_id}", f"prefetch_{task_id}"):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+    
+    async def remove_task(self, task_id: int):
         """删除任务"""
-        try:
-            session = Session()
-            task = session.query(ScheduledTask).filter_by(id=task_id).first()
-            if task:
-                # 从调度器中移除
-                self.scheduler.remove_job(f"task_{task.id}")
-                # 从数据库中删除
-                session.delete(task)
-                session.commit()
-                return True
-            return False
-        finally:
-            session.close()
+        async with AsyncSession() as session:
+            task = await session.get(ScheduledTask, task_id)
+            if task is None:
+                return False
+            # 从调度器中移除
+            await asyncio.to_thread(self.remove_jobs, task_id)
+            self.ready.pop(task_id, None)
+            # 从数据库中删除
+            await session.delete(task)
+            await session.commit()
+            return True
     
-    def get_tasks(self, chat_id: int):
+    async def get_tasks(self, chat_id: int):
         """获取用户的所有任务"""
-        session = Session()
-        try:
-            tasks = session.query(ScheduledTask).filter_by(chat_id=chat_id).all()
-            return tasks
-        finally:
-            session.close()
+        async with AsyncSession() as session:
+            result = await session.execute(
+                select(ScheduledTask).filter_by(chat_id=chat_id).order_by(ScheduledTask.id)
+            )
+            return result.scalars().all()
+    
+    def iter_task_chunks(self, chunk_size: int):
+        """按主键分块读取任务的列值，不一次性加载全部ORM对象"""
+        columns = (
+            ScheduledTask.id, ScheduledTask.chat_id, ScheduledTask.twitter_username,
+            ScheduledTask.tweet_count, ScheduledTask.schedule_time
+        )
+        last_id = 0
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(*columns).where(ScheduledTask.id > last_id).order_by(ScheduledTask.id).limit(chunk_size)
+                ).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+    
+    def stored_triggers(self, job_ids):
+        """读取已持久化调度任务的触发器描述，如 cron[hour='9', minute='0', second='23']"""
+        jobs_t = self.jobstore.jobs_t
+        with engine.connect() as conn:
+            rows = conn.execute(select(jobs_t.c.id, jobs_t.c.job_state).where(jobs_t.c.id.in_(job_ids))).all()
+        triggers = {}
+        for job_id, job_state in rows:
+            try:
+                triggers[job_id] = str(pickle.loads(job_state)['trigger'])
+            except Exception as e:
+                # 无法读取的任务按触发器不一致处理，重新注册
+                print(f"Failed to load scheduled job {job_id}: {str(e)}")
+        return triggers
+    
+    def sync_jobs(self):
+        """对齐持久化的调度任务与任务表：补注册缺失的任务，重新注册触发器已变化的任务，删除已不存在的任务
+
+        错峰窗口、预取提前量或合并摘要模式改变后，已保存任务的触发时间会随之更新
+        """
+        with engine.connect() as conn:
+            stored = set(conn.execute(select(self.jobstore.jobs_t.c.id)).scalars())
+        expected = set()
+        added = 0
+        updated = 0
+        for tasks in self.iter_task_chunks(Config.SCHEDULE_LOAD_CHUNK):
+            specs = {task.id: self.job_specs(task.chat_id, task.id, task.schedule_time) for task in tasks}
+            triggers = self.stored_triggers([job_id for jobs in specs.values() for job_id in jobs])
+            for task in tasks:
+                jobs = specs[task.id]
+                expected.update(jobs)
+                changed = [job_id for job_id, (_, trigger) in jobs.items() if triggers.get(job_id) != str(trigger)]
+                if changed:
+                    self.add_jobs(task.chat_id, task.twitter_username, task.tweet_count, task.id, task.schedule_time, changed)
+                    added += sum(1 for job_id in changed if job_id not in stored)
+                    updated += sum(1 for job_id in changed if job_id in stored)
+        orphans = stored - expected
+        for job_id in orphans:
+            self.scheduler.remove_job(job_id, jobstore='default')
+        print(f"Scheduled jobs synced: {len(expected)} total, {added} added, {updated} updated, {len(orphans)} removed")
     
     def start(self):
         """启动调度器并加载现有任务"""
-        session = Session()
+        global active_scheduler
+        active_scheduler = self
         try:
-            # 加载所有任务
-            tasks = session.query(ScheduledTask).all()
-            for task in tasks:
-                hour, minute = map(int, task.schedule_time.split(':'))
+            # 先以暂停状态启动，对齐任务后再恢复，错过的任务在恢复后按misfire_grace_time补执行
+            if not self.scheduler.running:
+                self.scheduler.start(paused=True)
+            self.sync_jobs()
+            
+            # 后台维护nitter实例注册表
+            self.scheduler.add_job(
+                self.maintain_instances,
+                IntervalTrigger(seconds=60),
+                id="maintain_instances",
+                jobstore='memory',
+                replace_existing=True
+            )
+            
+            # worker模式：定期发送worker完成的结果
+            if self.job_queue is not None:
                 self.scheduler.add_job(
-                    self.execute_task,
-                    CronTrigger(hour=hour, minute=minute),
-                    args=[task.chat_id, task.twitter_username, task.tweet_count],
-                    id=f"task_{task.id}"
+                    self.deliver_results,
+                    IntervalTrigger(seconds=Config.WORKER_POLL_INTERVAL),
+                    id="deliver_results",
+                    jobstore='memory',
+                    replace_existing=True,
+                    max_instances=1
                 )
             
-            # 启动调度器
-            if not self.scheduler.running:
-                self.scheduler.start()
+            # 恢复调度
+            self.scheduler.resume()
             print("Scheduler started successfully")
         except Exception as e:
             print(f"Failed to start scheduler: {e}")
-            raise
-        finally:
-            session.close() 
\ No newline at end of file
+            raise 
\ No newline at end of file
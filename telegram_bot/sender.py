@@ -0,0 +1,83 @@
+import asyncio
+from collections import deque
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
+from utils.ratelimit import TokenBucket
+from config import Config
+
+# Telegram单条消息的长度上限（留出余量）
+MESSAGE_LIMIT = 4000
+
+class MessageSender:
+    """统一的消息发送队列：全局和每个聊天分别限流，遇到RetryAfter自动等待重试，并合并发往同一聊天的短消息"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.global_bucket = TokenBucket(Config.TELEGRAM_GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.queues = {}  # chat_id -> deque[(text, kwargs, merge, future)]
+        self.workers = {}  # chat_id -> 发送任务
+
+    def send(self, chat_id: int, text: str, merge: bool = True, **kwargs):
+        """将消息加入发送队列，返回发送完成后得到Message的Future（可不等待）
+
+        之后还要编辑的消息（如流式总结的占位消息）需传入 merge=False，单独发送
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(chat_id, deque()).append((text, kwargs, merge, future))
+        worker = self.workers.get(chat_id)
+        if worker is None or worker.done():
+            self.workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return future
+
+    def _take_batch(self, queue):
+        """取出队首消息，并合并紧随其后、参数相同且合并后不超长的消息"""
+        text, kwargs, merge, future = queue.popleft()
+        futures = [future]
+        while merge and queue:
+            next_text, next_kwargs, next_merge, next_future = queue[0]
+            if not next_merge or next_kwargs != kwargs or 'reply_markup' in kwargs or \
+                    len(text) + len(next_text) + 2 > MESSAGE_LIMIT:
+                break
+            queue.popleft()
+            text = f"{text}\n\n{next_text}"
+            futures.append(next_future)
+        return text, kwargs, futures
+
+    async def _drain(self, chat_id: int):
+        """按限流速率依次发送某个聊天的队列"""
+        queue = self.queues[chat_id]
+        bucket = self.chat_buckets.setdefault(chat_id, TokenBucket(Config.TELEGRAM_CHAT_RATE, 1))
+        while queue:
+            text, kwargs, futures = self._take_batch(queue)
+            try:
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                message = await self._send_with_retry(chat_id, text, kwargs)
+                for future in futures:
+                    if not future.done():
+                        future.set_result(message)
+            except Exception as e:
+                print(f"Failed to send message to {chat_id}: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+        self.queues.pop(chat_id, None)
+        self.workers.pop(chat_id, None)
+
+    async def _send_with_retry(self, chat_id: int, text: str, kwargs):
+        """发送消息：RetryAfter按Telegram要求等待，网络错误按退避重试"""
+        attempt = 0
+        while True:
+            try:
+                return await self.bot.send_message(chat_id, text, **kwargs)
+            except BadRequest:
+                raise
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                print(f"Flood control for chat {chat_id}, retrying in {retry_after}s")
+                await asyncio.sleep(retry_after)
+            except (TimedOut, NetworkError):
+                if attempt >= Config.TELEGRAM_SEND_RETRIES:
+                    raise
+                attempt += 1
+                await asyncio.sleep(2 ** attempt)
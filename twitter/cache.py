@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+class PageCache:
+    """nitter页面的解析结果缓存：按实例+用户名保存推文列表和ETag/Last-Modified，用于短时复用和条件请求"""
+
+    def __init__(self, ttl: float, stale_ttl: float, size: int):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (实例, 小写用户名) -> 缓存项
+        self.latest = {}  # 小写用户名 -> 最近更新的实例
+
+    def get(self, instance: str, username: str, count: int):
+        """返回能满足count条的缓存项（不论是否过期，供条件请求使用）"""
+        key = (instance, username.lower())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not self.covers(entry, count):
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def get_latest(self, username: str, count: int):
+        """返回该用户在任意实例上最近更新的缓存项"""
+        with self.lock:
+            instance = self.latest.get(username.lower())
+        return self.get(instance, username, count) if instance else None
+
+    @staticmethod
+    def covers(entry, count: int) -> bool:
+        """缓存的推文数足够，或者当时已取完全部推文"""
+        return entry['count'] >= count or entry['complete']
+
+    def age(self, entry) -> float:
+        return time.time() - entry['fetched_at']
+
+    def is_fresh(self, entry) -> bool:
+        return self.age(entry) < self.ttl
+
+    def is_usable_stale(self, entry) -> bool:
+        return self.age(entry) < self.stale_ttl
+
+    def put(self, instance: str, username: str, tweets, count: int, headers=None, complete: bool = False):
+        """保存解析结果和验证头；complete 表示已取到时间线末尾，可满足任意数量"""
+        headers = headers or {}
+        key = (instance, username.lower())
+        entry = {
+            'tweets': tweets,
+            'count': count,
+            'complete': complete,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.latest[key[1]] = instance
+            while len(self.entries) > self.size:
+                (old_instance, old_username), _ = self.entries.popitem(last=False)
+                if self.latest.get(old_username) == old_instance:
+                    del self.latest[old_username]
+
+    def touch(self, entry, headers=None):
+        """304未修改：沿用缓存的推文，刷新时间和验证头"""
+        headers = headers or {}
+        with self.lock:
+            entry['fetched_at'] = time.time()
+            entry['etag'] = headers.get('ETag') or entry['etag']
+            entry['last_modified'] = headers.get('Last-Modified') or entry['last_modified']
+
+    @staticmethod
+    def validators(entry):
+        """条件请求头"""
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
@@ -0,0 +1,108 @@
+import glob
+import gzip
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+UNSAFE_CHARS_RE = re.compile(r'[^\w.-]+')
+
+class HtmlCapture:
+    """抽样保存抓取到的页面（gzip压缩），后台线程写入，按数量和总大小淘汰最旧的文件
+
+    保存的页面可作为解析器基准测试和回放调试的样本，见 load_captures
+    """
+
+    def __init__(self, directory: str, rate: float, max_files: int, max_bytes: int, debug_print=None):
+        self.directory = directory
+        self.rate = rate
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.debug_print = debug_print or (lambda message: None)
+        self.queue = queue.Queue(maxsize=64)
+        self.worker = None
+        self.files = None  # 路径 -> 大小，按写入先后排列
+        self.total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def capture(self, url: str, html: str):
+        """按抽样率保存页面；只入队不写盘，队列满时直接丢弃，不阻塞调用方"""
+        if not self.enabled or random.random() >= self.rate:
+            return
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._run, name="html-capture", daemon=True)
+            self.worker.start()
+        try:
+            self.queue.put_nowait((url, html, time.time()))
+        except queue.Full:
+            self.debug_print("页面保存队列已满，丢弃本次保存")
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+        while True:
+            url, html, captured_at = self.queue.get()
+            try:
+                self._write(url, html, captured_at)
+                self._rotate()
+            except Exception as e:
+                self.debug_print(f"❌ 保存HTML时出错: {str(e)}")
+
+    def _load_index(self):
+        """读取已有的保存文件，重启后继续按上限淘汰"""
+        paths = glob.glob(os.path.join(self.directory, '*.html.gz'))
+        paths.sort(key=os.path.getmtime)
+        self.files = OrderedDict((path, os.path.getsize(path)) for path in paths)
+        self.total_bytes = sum(self.files.values())
+
+    def _write(self, url: str, html: str, captured_at: float):
+        parsed = urlparse(url)
+        name = UNSAFE_CHARS_RE.sub('_', f"{parsed.netloc}{parsed.path}").strip('_')
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(captured_at))
+        path = os.path.join(self.directory, f"{name}_{stamp}_{int(captured_at * 1000) % 1000:03d}.html.gz")
+        data = gzip.compress(html.encode('utf-8'), compresslevel=6)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if path in self.files:
+            self.total_bytes -= self.files.pop(path)
+        self.files[path] = len(data)
+        self.total_bytes += len(data)
+        self.debug_print(f"✅ HTML已保存到: {path}")
+
+    def _rotate(self):
+        """超过数量或总大小上限时删除最旧的文件"""
+        while self.files and (len(self.files) > self.max_files or self.total_bytes > self.max_bytes):
+            path, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load_captures(paths):
+    """读取保存的页面（.html 或 .html.gz），目录会展开为其中的文件"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                glob.glob(os.path.join(path, '*.html')) + glob.glob(os.path.join(path, '*.html.gz'))
+            ))
+        else:
+            files.append(path)
+    pages = []
+    for file in files:
+        if file.endswith('.gz'):
+            with gzip.open(file, 'rt', encoding='utf-8') as f:
+                pages.append(f.read())
+        else:
+            with open(file, encoding='utf-8') as f:
+                pages.append(f.read())
+    return pages
@@ -1,19 +1,30 @@
+import asyncio
+import httpx
 import requests
 from bs4 import BeautifulSoup
-import re
-import random
 import time
-import json
 import urllib3
-import os
-import shutil
 from urllib.parse import urlparse
 from config import Config
+from twitter.instances import InstanceRegistry
+from twitter.cache import PageCache
+from twitter.capture import HtmlCapture
+from twitter.parser import HeuristicParser, create_parser, parse_cursor, count_items, is_profile_page, is_not_found_page
+from utils.text import normalize_tweet_text
+from utils.ratelimit import AdaptiveThrottle
 import cloudscraper  # 添加 cloudscraper 库
+import importlib.util
+from requests.adapters import HTTPAdapter
 
 # 禁用不安全请求警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# 安装了 h2 时启用 HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Cloudflare 等质询页面的特征
+CHALLENGE_MARKERS = ('cf-browser-verification', 'challenge-platform', 'Just a moment...', 'cf_chl_opt')
+
 class TwitterClient:
     def __init__(self):
         self.headers = {
@@ -28,9 +39,31 @@ class TwitterClient:
             "Referer": "https://nitter.net/",  # 添加 Referer
             "Origin": "https://nitter.net"     # 添加 Origin
         }
-        self.delay_range = (2, 5)
         self.debug = Config.DEBUG_CRAWLER
         self.scraper = cloudscraper.create_scraper()  # 初始化 cloudscraper
+        self.instance_registry = InstanceRegistry()  # 持久化的实例健康状况
+        # 页面解析器：快速解析失败时退回启发式解析
+        self.fallback_parser = HeuristicParser(self.debug_print)
+        self.parser = self.fallback_parser if Config.NITTER_PARSER == 'heuristic' \
+            else create_parser(Config.NITTER_PARSER, self.debug_print)
+        
+        # 长连接池：同一实例的重复请求复用已建立的TCP/TLS连接
+        self.session = requests.Session()
+        self.session.max_redirects = 3
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=Config.NITTER_MAX_CONNECTIONS_PER_HOST)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.async_client = None
+        self.host_semaphores = {}
+        # 解析结果缓存：短时间内重复请求直接复用，过期后发送条件请求
+        self.page_cache = PageCache(Config.NITTER_CACHE_TTL, Config.NITTER_CACHE_STALE_TTL, Config.NITTER_CACHE_SIZE)
+        self.revalidating = {}  # 用户名 -> 后台刷新任务
+        # 按实例自适应限流，替代每次请求前固定的随机等待
+        self.throttle = AdaptiveThrottle(
+            Config.NITTER_HOST_MAX_RATE, Config.NITTER_HOST_MIN_RATE, Config.NITTER_HOST_BURST
+        )
+        # 返回过质询页面的主机，后续请求改用 cloudscraper
+        self.challenge_hosts = set()
         # 默认的nitter实例列表（作为备份）
         self.default_instances = [
             "https://nitter.net",
@@ -39,64 +72,101 @@ class TwitterClient:
             "https://nitter.moomoo.me",
             "https://nitter.weiler.rocks"
         ]
-        
-        # 创建并清理temp目录
-        self.temp_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'temp')
-        self.clean_temp_directory()
-
-    def clean_temp_directory(self):
-        """清理temp目录"""
-        try:
-            if os.path.exists(self.temp_dir):
-                self.debug_print("清理temp目录...")
-                shutil.rmtree(self.temp_dir)
-            os.makedirs(self.temp_dir, exist_ok=True)
-            self.debug_print("✅ temp目录已准备就绪")
-        except Exception as e:
-            self.debug_print(f"❌ 清理temp目录时出错: {str(e)}")
-
-    def save_html_to_temp(self, url: str, html_content: str):
-        """保存HTML内容到temp目录"""
-        try:
-            # 从URL生成文件名
-            parsed_url = urlparse(url)
-            filename = f"{parsed_url.netloc}{parsed_url.path}".replace('/', '_') + '.html'
-            filepath = os.path.join(self.temp_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            self.debug_print(f"✅ HTML已保存到: {filepath}")
-        except Exception as e:
-            self.debug_print(f"❌ 保存HTML时出错: {str(e)}")
+        # 抽样保存抓取的页面，后台写入，不影响抓取耗时
+        self.capture = HtmlCapture(
+            Config.CAPTURE_DIR, Config.CAPTURE_SAMPLE_RATE,
+            Config.CAPTURE_MAX_FILES, Config.CAPTURE_MAX_BYTES, self.debug_print
+        )
 
     def clean_tweet_text(self, text: str) -> str:
         """清理推文文本，移除用户名和时间信息，但保留置顶标识"""
-        # 检查并保留置顶标识（支持emoji和英文两种形式）
-        is_pinned = '📌' in text or 'Pinned' in text
-        
-        # 如果是英文Pinned标识，替换为emoji
-        text = text.replace('Pinned', '📌')
-        
-        # 移除包含 @ 的用户名信息
-        text = ' '.join([word for word in text.split() if not word.startswith('@')])
-        
-        # 移除日期信息（通常在推文末尾，格式如 Jan 28）
-        text = ' '.join([word for word in text.split() if not any(month in word for month in ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])])
-        
-        # 移除其他常见的时间格式（如 5h, 2d 等）
-        text = ' '.join([word for word in text.split() if not (word.endswith(('h', 'd', 'm')) and word[:-1].isdigit())])
-        
-        # 如果原文包含置顶标识，确保保留
-        if is_pinned and not text.startswith('📌'):
-            text = '📌 ' + text
-        
-        return text.strip()
+        return normalize_tweet_text(text).display_text
 
     def debug_print(self, message):
         """调试信息打印"""
         if self.debug:
             print(f"[Crawler Debug] {message}")
 
+    def get_async_client(self):
+        """获取共享的异步HTTP客户端，连接在多次请求之间保持复用"""
+        if self.async_client is None or self.async_client.is_closed:
+            self.async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=10,
+                verify=False,
+                follow_redirects=True,
+                max_redirects=3,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=None,
+                    max_keepalive_connections=Config.NITTER_MAX_KEEPALIVE,
+                    keepalive_expiry=60
+                )
+            )
+        return self.async_client
+
+    async def aclose(self):
+        """关闭共享连接池"""
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+        self.session.close()
+
+    def get_host_semaphore(self, host: str):
+        """每个主机的并发连接上限"""
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(Config.NITTER_MAX_CONNECTIONS_PER_HOST)
+            self.host_semaphores[host] = semaphore
+        return semaphore
+
+    def is_challenge(self, status_code: int, text: str) -> bool:
+        """判断响应是否为 Cloudflare 等反爬质询页面"""
+        return status_code in (403, 429, 503) and any(marker in text for marker in CHALLENGE_MARKERS)
+
+    def update_throttle(self, host: str, status_code: int, text: str, headers=None):
+        """根据响应调整实例的请求速率：限流或质询时退避，成功时逐步恢复"""
+        if status_code in (429, 503) or self.is_challenge(status_code, text):
+            retry_after = (headers or {}).get('Retry-After')
+            retry_after = int(retry_after) if retry_after and retry_after.isdigit() else None
+            self.debug_print(f"⚠️ {host} 返回 {status_code}，降低请求速率")
+            self.throttle.on_throttled(host, retry_after)
+        elif status_code < 400:
+            self.throttle.on_success(host)
+
+    def _scraper_get(self, url: str, headers=None):
+        """使用 cloudscraper 发送请求，返回 (状态码, 页面内容, 最终URL, 响应头)"""
+        response = self.scraper.get(url, headers={**self.headers, **(headers or {})}, timeout=10)
+        return response.status_code, response.text, response.url, response.headers
+
+    def _throttled_scraper_get(self, url: str, host: str, headers=None):
+        """使用 cloudscraper 请求并按响应调整限流（同步，在线程中执行；调用方需先等待请求名额）"""
+        result = self._scraper_get(url, headers)
+        self.update_throttle(host, result[0], result[1], result[3])
+        return result
+
+    async def request_page_async(self, url: str):
+        """异步请求页面，复用共享连接池；遇到质询页面时改用 cloudscraper"""
+        return (await self._request_async(url))[:3]
+
+    async def _request_async(self, url: str, headers=None):
+        """异步请求页面，可附加请求头（如条件请求），返回 (状态码, 页面内容, 最终URL, 响应头)"""
+        host = urlparse(url).netloc
+        if host in self.challenge_hosts:
+            await self.throttle.wait_async(host)
+            return await asyncio.to_thread(self._throttled_scraper_get, url, host, headers)
+
+        await self.throttle.wait_async(host)
+        async with self.get_host_semaphore(host):
+            response = await self.get_async_client().get(url, headers=headers)
+        self.update_throttle(host, response.status_code, response.text, response.headers)
+        if Config.NITTER_CLOUDSCRAPER_FALLBACK and self.is_challenge(response.status_code, response.text):
+            self.debug_print(f"⚠️ {host} 返回质询页面，改用 cloudscraper")
+            self.challenge_hosts.add(host)
+            await self.throttle.wait_async(host)
+            return await asyncio.to_thread(self._throttled_scraper_get, url, host, headers)
+        return response.status_code, response.text, str(response.url), response.headers
+
     def get_nitter_instances(self):
         """获取最新的nitter实例列表"""
         try:
@@ -112,7 +182,7 @@ class TwitterClient:
             for source in sources:
                 try:
                     self.debug_print(f"尝试从 {source} 获取nitter实例列表...")
-                    response = requests.get(source, headers=self.headers, timeout=10, verify=False)
+                    response = self.session.get(source, headers=self.headers, timeout=10, verify=False)
                     
                     if response.status_code == 200:
                         if source.endswith('.json'):
@@ -145,10 +215,6 @@ class TwitterClient:
                 self.debug_print("使用默认nitter实例列表")
                 return self.default_instances
             
-            # 过滤掉已知的不可用实例
-            blacklist = {}  # 可以添加已知不可用的实例
-            instances = [i for i in instances if not any(b in i for b in blacklist)]
-            
             self.debug_print(f"最终获取到 {len(instances)} 个nitter实例")
             return list(instances)
             
@@ -156,209 +222,346 @@ class TwitterClient:
             self.debug_print(f"获取nitter实例列表失败: {str(e)}")
             return self.default_instances
 
-    def get_recent_tweets(self, username: str, count: int = 5):
-        """获取用户最近的推文"""
+    def refresh_instances(self, force: bool = False):
+        """实例列表过期时重新获取，并写回注册表"""
+        if force or self.instance_registry.needs_refresh():
+            self.instance_registry.update_instances(self.get_nitter_instances())
+        self.instance_registry.flush()
+
+    def is_newer(self, tweet_id, since_id) -> bool:
+        """推文是否比水位更新（推文ID随时间单调递增）
+
+        转推显示的是原推文的ID，转推早于水位的旧推文会被视为旧推文过滤掉
+        """
+        if since_id is None:
+            return True
+        return tweet_id is not None and int(tweet_id) > int(since_id)
+
+    def filter_newer(self, tweets, since_id):
+        """只保留比水位更新的推文"""
+        if since_id is None:
+            return tweets
+        return [tweet for tweet in tweets if self.is_newer(tweet.get('id'), since_id)]
+
+    def parse_page(self, html: str, username: str, count: int, since_id=None):
+        """解析一页推文，同时返回是否已到达水位（出现了不比since_id新的非置顶、非转推推文）"""
+        items = self.parser.parse(html, count)
+        if not items and self.parser is not self.fallback_parser:
+            # 快速解析未找到推文时，退回启发式解析
+            self.debug_print(f"{self.parser.name} 解析器未找到推文，改用启发式解析")
+            items = self.fallback_parser.parse(html, count)
+        if not items:
+            return None, False
+
+        tweets = []
+        reached = False
+        for item in items[:count]:
+            # 跳过水位之前的旧推文，不再做后续清理
+            if not self.is_newer(item['tweet_id'], since_id):
+                # 置顶推文和转推的ID可能很旧，不代表之后都是旧推文
+                reached = reached or not (item['pinned'] or item.get('retweet'))
+                continue
+            # 清理推文文本，归一化结果供总结缓存和去重直接复用
+            normalized = normalize_tweet_text(item['text'])
+            if item['pinned']:
+                normalized = normalized._replace(pinned=True)
+            tweet = {
+                "id": item['tweet_id'],
+                "text": normalized.text,
+                "pinned": normalized.pinned,
+                "retweet": bool(item.get('retweet')),
+                "mentions": list(normalized.mentions),
+                "links": list(normalized.links),
+                "key": normalized.key,
+                "time": item['time'],
+                "stats": item['stats'],
+                "url": f"https://x.com/{username}/status/{item['tweet_id']}" if item['tweet_id'] else None,
+                "order": len(tweets) + 1  # 添加顺序标记
+            }
+            tweets.append(tweet)
+        return tweets, reached
+
+    async def _fetch_from_instance(self, instance: str, username: str, count: int, since_id=None):
+        """从单个nitter实例获取并解析推文，失败时返回None
+        
+        使用解析结果缓存：未过期直接返回，过期则发送条件请求，304时不再下载和解析；
+        指定since_id时缓存结果按水位过滤，翻页到水位为止且结果不写入缓存
+        """
+        url = f"{instance}/{username}"
+        cached = self.page_cache.get(instance, username, count)
+        if cached is not None and self.page_cache.is_fresh(cached):
+            self.debug_print(f"使用 {instance} 的缓存结果")
+            return self.filter_newer(cached['tweets'][:count], since_id)
+
+        started = time.time()
+        tweets = None
+        # 用户不存在等非实例故障的结果不影响实例健康状况
+        neutral = False
         try:
-            delay = random.uniform(*self.delay_range)
-            self.debug_print(f"等待 {delay:.2f} 秒后开始获取推文...")
-            time.sleep(delay)
-            
-            # 获取最新的nitter实例列表
-            nitter_instances = self.get_nitter_instances()
-            self.debug_print(f"准备尝试的nitter实例数量: {len(nitter_instances)}")
-            
-            tweets = []
-            success = False
-            
-            # 随机打乱实例列表顺序
-            random.shuffle(nitter_instances)
-            
-            for instance in nitter_instances:
+            self.debug_print(f"\n=== 尝试访问URL: {url} ===")
+            validators = self.page_cache.validators(cached) if cached is not None else None
+            status_code, html, final_url, headers = await self._request_async(url, validators)
+
+            # 检查是否被重定向到本地
+            if '127.0.0.1' in final_url or 'localhost' in final_url:
+                self.debug_print(f"❌ 被重定向到本地地址：{final_url}，跳过此URL")
+            elif status_code == 304 and cached is not None:
+                self.debug_print(f"{instance} 返回304，页面未变化，沿用缓存结果")
+                self.page_cache.touch(cached, headers)
+                tweets = self.filter_newer(cached['tweets'][:count], since_id)
+            elif status_code == 404:
+                # 用户名错误或账号已注销，不是实例的故障
+                neutral = True
+                if is_not_found_page(html):
+                    # 其他实例的结果也一样，不再继续尝试
+                    self.debug_print(f"{instance} 返回用户 @{username} 不存在")
+                    tweets = []
+                else:
+                    self.debug_print(f"请求状态码: {status_code}")
+            elif status_code != 200:
+                self.debug_print(f"请求状态码: {status_code}")
+            else:
+                self.capture.capture(final_url, html)
+                tweets, complete = await self._collect_pages(instance, username, count, since_id, html)
+                # 翻页失败得到的部分结果不写入缓存
+                if tweets is not None and since_id is None and complete is not None:
+                    self.page_cache.put(instance, username, tweets, count, headers, complete)
+            if tweets is not None:
+                self.debug_print(f"成功从 {instance} 获取 {len(tweets)} 条新推文")
+            else:
+                self.debug_print(f"未能从 {instance} 提取到任何有效推文")
+
+        except httpx.TimeoutException:
+            self.debug_print(f"请求超时，跳过实例 {instance}")
+        except httpx.HTTPError as e:
+            self.debug_print(f"请求错误，跳过实例 {instance}: {str(e)}")
+        except Exception as e:
+            self.debug_print(f"未知错误，跳过实例 {instance}: {str(e)}")
+
+        # 更新实例健康状况（被取消的对冲请求不计入）
+        if tweets is not None and not neutral:
+            self.instance_registry.record_success(instance, time.time() - started)
+        elif tweets is None and not neutral:
+            self.instance_registry.record_failure(instance)
+        return tweets
+
+    async def _collect_pages(self, instance: str, username: str, count: int, since_id, html: str):
+        """解析首页并沿翻页链接继续抓取，直到够count条、到达水位或没有下一页，返回 (推文, 是否已取完)
+        
+        解析当前页的同时预先请求下一页（确定需要时才预取）。已取完表示到达了时间线末尾；
+        因数量、水位或 NITTER_MAX_PAGES 停止时为False；翻页失败时返回已获取的推文和None
+        """
+        url = f"{instance}/{username}"
+        tweets = []
+        seen = set()
+        page = 1
+        next_request = None
+        try:
+            while True:
+                # 翻页链接只需字符串匹配；本页推文不足以凑够count且未包含水位推文时，解析前就开始请求下一页
+                cursor = parse_cursor(html)
+                last_page = cursor is None
+                if page >= Config.NITTER_MAX_PAGES:
+                    cursor = None
+                if cursor and len(tweets) + count_items(html) < count and \
+                        (since_id is None or f"/status/{since_id}" not in html):
+                    next_request = asyncio.create_task(self.request_page_async(url + cursor))
+
+                # BeautifulSoup解析是CPU密集操作，放到线程中执行
+                page_tweets, reached = await asyncio.to_thread(
+                    self.parse_page, html, username, count - len(tweets), since_id
+                )
+                if page_tweets is None:
+                    if count_items(html):
+                        # 页面中有推文却没有解析出来，不能当作时间线已结束
+                        self.debug_print(f"第 {page} 页未能解析出推文")
+                        return (None, False) if page == 1 else (tweets, None)
+                    # 首页没有推文且不是正常的用户主页视为失败，后续页没有推文说明已到末尾
+                    if page == 1:
+                        return ([], True) if is_profile_page(html) else (None, False)
+                    return tweets, True
+                for tweet in page_tweets:
+                    if tweet['id'] is None or tweet['id'] not in seen:
+                        seen.add(tweet['id'])
+                        tweet['order'] = len(tweets) + 1
+                        tweets.append(tweet)
+
+                if len(tweets) >= count or reached or not cursor:
+                    return tweets[:count], last_page and not reached
+
+                if next_request is None:
+                    next_request = asyncio.create_task(self.request_page_async(url + cursor))
                 try:
-                    url = f"{instance}/{username}"
-                    self.debug_print(f"\n=== 尝试访问URL: {url} ===")
-                    
-                    # 创建session并设置重定向处理
-                    session = requests.Session()
-                    session.max_redirects = 3
-                    
-                    # 发送请求，禁用SSL验证
-                    self.debug_print("发送请求...")
-                    response = session.get(
-                        url,
-                        headers=self.headers,
-                        timeout=10,
-                        verify=False,
-                        allow_redirects=True
-                    )
-                    
-                    # 检查是否被重定向到本地
-                    if '127.0.0.1' in response.url or 'localhost' in response.url:
-                        self.debug_print(f"❌ 被重定向到本地地址：{response.url}，跳过此URL")
-                        continue
-                        
-                    # 如果发生了重定向，输出最终URL
-                    if response.url != url:
-                        self.debug_print(f"⚠️ 发生重定向")
-                        self.debug_print(f"原始URL: {url}")
-                        self.debug_print(f"最终URL: {response.url}")
-                        
-                    self.debug_print(f"请求状态码: {response.status_code}")
-                    
-                    if response.status_code == 200:
-                        self.debug_print("✅ 请求成功")
-                        
-                        # 保存HTML到temp目录
-                        self.save_html_to_temp(response.url, response.text)
-                        
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        self.debug_print("成功解析页面HTML")
-                        
-                        # 输出页面基本结构
-                        self.debug_print("\n=== 页面结构分析 ===")
-                        self.debug_print(f"页面标题: {soup.title.string if soup.title else '无标题'}")
-                        
-                        # 检查是否是错误页面
-                        error_msg = soup.find(class_=lambda x: x and 'error' in str(x).lower())
-                        if error_msg:
-                            self.debug_print(f"⚠️ 检测到错误信息: {error_msg.get_text().strip()}")
-                        
-                        # 查找推文容器
-                        timeline = soup.find('div', class_='timeline')
-                        self.debug_print("\n=== Timeline容器查找 ===")
-                        if timeline:
-                            self.debug_print("✅ 找到timeline容器")
-                            self.debug_print(f"Timeline容器类名: {timeline.get('class', [])}")
-                            tweet_items = timeline.find_all(['div', 'article'], class_=['timeline-item', 'tweet-card', 'tweet'])
-                            self.debug_print(f"在timeline中找到 {len(tweet_items)} 条推文")
-                        else:
-                            self.debug_print("❌ 未找到timeline容器")
-                            self.debug_print("检查所有div的class属性:")
-                            for div in soup.find_all('div', class_=True):
-                                self.debug_print(f"发现div，类名: {div.get('class', [])}")
-                            
-                            self.debug_print("\n尝试直接查找推文...")
-                            tweet_items = soup.find_all(['div', 'article'], class_=['timeline-item', 'tweet-card', 'tweet'])
-                            
-                        self.debug_print(f"\n=== 推文查找结果 ===")
-                        self.debug_print(f"找到 {len(tweet_items)} 条原始推文")
-                        
-                        if not tweet_items:
-                            self.debug_print("\n=== 使用备用选择器 ===")
-                            self.debug_print("搜索包含tweet或timeline-item的所有元素")
-                            tweet_items = soup.find_all(class_=lambda x: x and any(term in str(x).lower() for term in ['tweet', 'timeline-item']))
-                            self.debug_print(f"使用备用选择器找到 {len(tweet_items)} 条推文")
-                        
-                        for item in tweet_items:
-                            if len(tweets) >= count:
-                                break
-                                
-                            # 获取推文内容
-                            tweet_content = None
-                            # 首先尝试精确匹配新发现的类名
-                            tweet_content = item.find('div', class_='tweet-content media-body')
-                            
-                            # 如果精确匹配失败，尝试现有的模糊匹配方案
-                            if not tweet_content or not tweet_content.get_text().strip():
-                                content_candidates = item.find_all(['div', 'p'], class_=lambda x: x and any(term in str(x).lower() for term in ['content', 'text', 'body']))
-                                
-                                for candidate in content_candidates:
-                                    if candidate.get_text().strip():
-                                        tweet_content = candidate
-                                        break
-                                        
-                            if not tweet_content:
-                                self.debug_print("跳过一条无内容的推文")
-                                continue
-                                
-                            content_text = tweet_content.get_text().strip()
-                            if not content_text:
-                                self.debug_print("跳过一条空内容的推文")
-                                continue
-                                
-                            # 清理推文文本
-                            content_text = self.clean_tweet_text(content_text)
-                            
-                            # 获取时间
-                            time_element = item.find(['span', 'a'], class_=lambda x: x and any(term in str(x).lower() for term in ['date', 'time']))
-                            tweet_time = "Unknown time"
-                            if time_element:
-                                tweet_time = time_element.get('title', None) or time_element.get_text().strip()
-                            
-                            # 获取统计信息
-                            stats = {}
-                            stats_elements = item.find_all(['span', 'div'], class_=lambda x: x and any(term in str(x).lower() for term in ['stat', 'count', 'activity']))
-                            
-                            for stat in stats_elements:
-                                text = stat.get_text().strip().lower()
-                                if 'retweet' in text or '转推' in text or 'rt' in text:
-                                    match = re.search(r'\d+', text)
-                                    if match:
-                                        stats['retweets'] = match.group()
-                                elif 'like' in text or '喜欢' in text:
-                                    match = re.search(r'\d+', text)
-                                    if match:
-                                        stats['likes'] = match.group()
-                            
-                            # 获取推文ID
-                            tweet_id = None
-                            tweet_link = item.find('a', class_=lambda x: x and any(term in str(x).lower() for term in ['link', 'tweet-link', 'tweet-date']))
-                            if tweet_link and 'href' in tweet_link.attrs:
-                                href = tweet_link['href']
-                                id_match = re.search(r'/status/(\d+)', href)
-                                if id_match:
-                                    tweet_id = id_match.group(1)
-                            
-                            tweet = {
-                                "text": content_text,
-                                "time": tweet_time,
-                                "stats": stats,
-                                "url": f"https://x.com/{username}/status/{tweet_id}" if tweet_id else None,
-                                "order": len(tweets) + 1  # 添加顺序标记
-                            }
-                            tweets.append(tweet)
-                            self.debug_print(f"已处理第 {len(tweets)} 条推文，发布时间: {tweet_time}")
-                        
-                        if tweets:
-                            success = True
-                            self.debug_print(f"成功从 {instance} 获取推文")
-                            break
-                        else:
-                            self.debug_print("未能提取到任何有效推文，尝试下一个实例")
-                    
-                except requests.exceptions.SSLError:
-                    self.debug_print(f"SSL错误，跳过实例 {instance}")
-                    continue
-                except requests.exceptions.Timeout:
-                    self.debug_print(f"请求超时，跳过实例 {instance}")
-                    continue
-                except requests.exceptions.RequestException as e:
-                    self.debug_print(f"请求错误，跳过实例 {instance}: {str(e)}")
+                    status_code, html, final_url = await next_request
+                except httpx.HTTPError as e:
+                    self.debug_print(f"翻页请求失败，返回已获取的推文: {str(e)}")
+                    return tweets, None
+                finally:
+                    next_request = None
+                if status_code != 200:
+                    self.debug_print(f"翻页请求状态码: {status_code}，返回已获取的推文")
+                    return tweets, None
+                page += 1
+                self.debug_print(f"已获取第 {page} 页")
+                self.capture.capture(final_url, html)
+        finally:
+            if next_request is not None:
+                next_request.cancel()
+
+    async def _hedged_fetch(self, instances, username: str, count: int, since_id=None):
+        """对冲请求：错峰并发请求多个实例，取第一个有效结果并取消其余请求"""
+        width = max(1, Config.NITTER_HEDGE_WIDTH)
+        delay = Config.NITTER_HEDGE_DELAY
+        remaining = iter(instances)
+        deferred = []  # 限流等待超过对冲延迟的实例，其他实例都失败后才使用
+        pending = set()
+        exhausted = False
+
+        def launch():
+            while True:
+                instance = next(remaining, None)
+                if instance is None:
+                    if not deferred:
+                        return False
+                    instance = deferred.pop(0)
+                elif self.throttle.delay(urlparse(instance).netloc) > delay:
+                    self.debug_print(f"{instance} 限流等待过长，暂不请求")
+                    deferred.append(instance)
                     continue
-                except Exception as e:
-                    self.debug_print(f"未知错误，跳过实例 {instance}: {str(e)}")
+                break
+            pending.add(asyncio.create_task(
+                self._fetch_from_instance(instance, username, count, since_id)
+            ))
+            return True
+
+        try:
+            exhausted = not launch()
+            while pending:
+                # 并发数未满时，等待对冲延迟后追加下一个实例
+                can_hedge = not exhausted and len(pending) < width
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    exhausted = not launch()
                     continue
-                finally:
-                    if 'session' in locals():
-                        session.close()
-            
-            if not success:
+
+                for task in done:
+                    pending.discard(task)
+                    tweets = task.result()
+                    if tweets is not None:
+                        return tweets
+                    # 失败的请求立即由下一个实例补位
+                    if not exhausted:
+                        exhausted = not launch()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def get_recent_tweets_async(self, username: str, count: int = 5, since_id=None, allow_stale: bool = False):
+        """异步获取用户最近的推文，不阻塞事件循环
+        
+        指定since_id时只返回比该推文ID更新的推文；allow_stale时可直接返回稍旧的缓存结果并在后台刷新
+        """
+        if count < 1:
+            return []
+        cached = self.page_cache.get_latest(username, count)
+        if cached is not None and self.page_cache.is_fresh(cached):
+            self.debug_print(f"使用 @{username} 的缓存结果")
+            return self.filter_newer(cached['tweets'][:count], since_id)
+        if cached is not None and allow_stale and self.page_cache.is_usable_stale(cached):
+            self.debug_print(f"返回 @{username} 的过期缓存结果，后台刷新")
+            self.revalidate(username, count)
+            return self.filter_newer(cached['tweets'][:count], since_id)
+        return await self._get_recent_tweets_async(username, count, since_id)
+
+    def revalidate(self, username: str, count: int):
+        """在后台刷新缓存，同一用户同时只有一个刷新任务"""
+        key = username.lower()
+        task = self.revalidating.get(key)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._get_recent_tweets_async(username, count))
+        task.add_done_callback(lambda _: self.revalidating.pop(key, None))
+        self.revalidating[key] = task
+
+    async def _get_recent_tweets_async(self, username: str, count: int, since_id=None):
+        try:
+            # 注册表为空时需要联网获取实例列表，放到线程中执行
+            if not self.instance_registry.instances:
+                await asyncio.to_thread(self.refresh_instances)
+            nitter_instances = self.instance_registry.get_ranked()
+            self.debug_print(f"准备尝试的nitter实例数量: {len(nitter_instances)}")
+
+            tweets = await self._hedged_fetch(nitter_instances, username, count, since_id)
+
+            if tweets is None:
                 self.debug_print("所有实例均获取失败")
                 return []
-            
+
             self.debug_print(f"最终获取到 {len(tweets)} 条推文")
             return tweets[:count]
-            
+
         except Exception as e:
             self.debug_print(f"获取推文过程中发生错误: {str(e)}")
             return []
 
+    async def get_many(self, usernames, count: int = 5, counts=None, since_ids=None):
+        """批量获取多个账号的推文，按完成顺序产出 (username, tweets)
+        
+        整批共用一份实例列表和连接池；同时抓取的账号数受 NITTER_BULK_CONCURRENCY 限制，
+        每个实例的并发连接数仍受 NITTER_MAX_CONNECTIONS_PER_HOST 限制。
+        counts 可按账号指定数量，since_ids 可按账号指定水位（只返回更新的推文）。
+        """
+        usernames = list(dict.fromkeys(usernames))
+        if not usernames:
+            return
+        self.debug_print(f"开始批量获取 {len(usernames)} 个账号的推文...")
+        if not self.instance_registry.instances:
+            await asyncio.to_thread(self.refresh_instances)
+        instances = self.instance_registry.get_ranked()
+        # 各账号从排名靠前的不同实例开始尝试，分散负载
+        spread = max(1, min(len(instances), Config.NITTER_HEDGE_WIDTH))
+        semaphore = asyncio.Semaphore(max(1, Config.NITTER_BULK_CONCURRENCY))
+
+        async def fetch(index: int, username: str):
+            shift = index % spread
+            ordered = instances[shift:] + instances[:shift]
+            user_count = (counts or {}).get(username, count)
+            since_id = (since_ids or {}).get(username)
+            if user_count < 1:
+                return username, []
+            async with semaphore:
+                try:
+                    tweets = await self._hedged_fetch(ordered, username, user_count, since_id)
+                except Exception as e:
+                    self.debug_print(f"获取 @{username} 的推文时发生错误: {str(e)}")
+                    tweets = None
+            if tweets is None:
+                self.debug_print(f"所有实例均未能获取 @{username} 的推文")
+            return username, (tweets or [])[:user_count]
+
+        tasks = [asyncio.create_task(fetch(index, username)) for index, username in enumerate(usernames)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     def fetch_page(self, url):
         try:
-            # 使用 cloudscraper 发送请求
-            delay = random.uniform(*self.delay_range)
-            time.sleep(delay)  # 设置随机延迟
+            # 使用 cloudscraper 发送请求（按实例限流）
+            host = urlparse(url).netloc
+            self.throttle.wait(host)
             response = self.scraper.get(url, headers=self.headers, timeout=10)
+            self.update_throttle(host, response.status_code, response.text, response.headers)
             response.raise_for_status()
             return response.text
         except Exception as e:
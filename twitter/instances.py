@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from database.models import Session, NitterInstance
+from config import Config
+
+class InstanceRegistry:
+    """nitter实例注册表：持久化实例健康状况，按健康分数排序并自动熔断故障实例"""
+
+    # 滑动平均的平滑系数
+    ALPHA = 0.3
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instances = {}  # url -> 统计信息字典
+        self.refreshed_at = 0
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """从数据库加载实例统计信息"""
+        session = Session()
+        try:
+            rows = session.query(NitterInstance).all()
+            with self.lock:
+                for row in rows:
+                    self.instances[row.url] = {
+                        'latency': row.latency,
+                        'success_rate': row.success_rate if row.success_rate is not None else 0.5,
+                        'consecutive_failures': row.consecutive_failures or 0,
+                        'last_success_at': row.last_success_at,
+                        'last_failure_at': row.last_failure_at,
+                        'circuit_open_until': row.circuit_open_until or 0,
+                        'discovered_at': row.discovered_at or 0
+                    }
+                if rows:
+                    self.refreshed_at = max(stats['discovered_at'] for stats in self.instances.values())
+        finally:
+            session.close()
+
+    def needs_refresh(self):
+        """实例列表是否已过期"""
+        return not self.instances or time.time() - self.refreshed_at > Config.NITTER_INSTANCE_TTL
+
+    def update_instances(self, urls):
+        """合并新发现的实例列表，保留已有实例的统计信息"""
+        now = time.time()
+        with self.lock:
+            for url in urls:
+                stats = self.instances.setdefault(url, {
+                    'latency': None,
+                    'success_rate': 0.5,
+                    'consecutive_failures': 0,
+                    'last_success_at': None,
+                    'last_failure_at': None,
+                    'circuit_open_until': 0,
+                    'discovered_at': now
+                })
+                stats['discovered_at'] = now
+            self.refreshed_at = now
+            self.dirty = True
+
+    def score(self, stats):
+        """健康分数：成功率越高、延迟越低分数越高"""
+        latency = stats['latency'] if stats['latency'] is not None else 2.0
+        return stats['success_rate'] / (1 + latency)
+
+    def get_ranked(self):
+        """按健康分数返回可用实例，熔断中的实例被跳过"""
+        now = time.time()
+        with self.lock:
+            available = [
+                (url, stats) for url, stats in self.instances.items()
+                if stats['circuit_open_until'] <= now
+            ]
+            # 加入少量随机扰动，避免所有请求都集中到同一个实例
+            available.sort(key=lambda item: self.score(item[1]) * random.uniform(0.9, 1.1), reverse=True)
+            ranked = [url for url, _ in available]
+
+        # 所有实例都被熔断时，退回使用全部实例
+        return ranked or list(self.instances.keys())
+
+    def record_success(self, url, latency):
+        """记录一次成功请求"""
+        with self.lock:
+            stats = self.instances.get(url)
+            if stats is None:
+                return
+            stats['latency'] = latency if stats['latency'] is None else \
+                (1 - self.ALPHA) * stats['latency'] + self.ALPHA * latency
+            stats['success_rate'] = (1 - self.ALPHA) * stats['success_rate'] + self.ALPHA
+            stats['consecutive_failures'] = 0
+            stats['circuit_open_until'] = 0
+            stats['last_success_at'] = time.time()
+            self.dirty = True
+
+    def record_failure(self, url):
+        """记录一次失败请求，连续失败达到阈值时熔断该实例"""
+        now = time.time()
+        with self.lock:
+            stats = self.instances.get(url)
+            if stats is None:
+                return
+            stats['success_rate'] = (1 - self.ALPHA) * stats['success_rate']
+            stats['consecutive_failures'] += 1
+            stats['last_failure_at'] = now
+            trips = stats['consecutive_failures'] - Config.NITTER_CIRCUIT_THRESHOLD
+            if trips >= 0:
+                # 熔断时间随连续失败次数指数增长，最长1天
+                cooldown = min(Config.NITTER_CIRCUIT_COOLDOWN * (2 ** trips), 86400)
+                stats['circuit_open_until'] = now + cooldown
+            self.dirty = True
+
+    def flush(self):
+        """将内存中的统计信息写回数据库"""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = {url: dict(stats) for url, stats in self.instances.items()}
+            self.dirty = False
+
+        session = Session()
+        try:
+            rows = {row.url: row for row in session.query(NitterInstance).all()}
+            for url, stats in snapshot.items():
+                row = rows.get(url)
+                if row is None:
+                    row = NitterInstance(url=url)
+                    session.add(row)
+                for key, value in stats.items():
+                    setattr(row, key, value)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self.lock:
+                self.dirty = True
+            raise
+        finally:
+            session.close()
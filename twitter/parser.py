@@ -0,0 +1,346 @@
+import re
+from html import unescape
+from bs4 import BeautifulSoup
+import soupsieve
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml 为可选依赖
+    lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxHTMLParser
+except ImportError:  # selectolax 为可选依赖
+    SelectolaxHTMLParser = None
+
+TWEET_ID_RE = re.compile(r'/status/(\d+)')
+NUMBER_RE = re.compile(r'\d[\d,]*')
+# 时间线底部“加载更多”的翻页链接，如 <div class="show-more"><a href="?cursor=...">
+CURSOR_RE = re.compile(r'class="[^"]*show-more[^"]*"[^>]*>\s*<a href="([^"]*cursor=[^"]+)"')
+ITEM_MARKER = 'class="timeline-item'
+# 用户主页的资料卡；用户不存在时nitter返回404和错误面板
+PROFILE_MARKER = 'class="profile-card'
+ERROR_PANEL_MARKER = 'class="error-panel'
+
+# nitter统计图标类名与统计字段的对应关系
+STAT_ICONS = {
+    'icon-comment': 'replies',
+    'icon-retweet': 'retweets',
+    'icon-quote': 'quotes',
+    'icon-heart': 'likes'
+}
+
+def _parse_number(text: str):
+    """提取统计数字，去掉千分位逗号"""
+    match = NUMBER_RE.search(text)
+    return match.group().replace(',', '') if match else None
+
+def _parse_tweet_id(href):
+    """从推文链接中提取推文ID"""
+    if not href:
+        return None
+    match = TWEET_ID_RE.search(href)
+    return match.group(1) if match else None
+
+
+def parse_cursor(html: str):
+    """提取下一页的翻页链接（相对地址），没有下一页时返回None；只做字符串匹配，无需完整解析"""
+    cursors = CURSOR_RE.findall(html)
+    # 翻页后的页面顶部还有“加载最新”的链接，下一页的链接总在最后
+    return unescape(cursors[-1]) if cursors else None
+
+def count_items(html: str) -> int:
+    """粗略统计页面中的推文数量，用于在解析前判断是否需要下一页"""
+    return html.count(ITEM_MARKER)
+
+def is_profile_page(html: str) -> bool:
+    """是否为正常的用户主页（没有推文的新账号、受保护账号也有资料卡）"""
+    return PROFILE_MARKER in html
+
+def is_not_found_page(html: str) -> bool:
+    """是否为nitter的用户不存在页面"""
+    return ERROR_PANEL_MARKER in html
+
+
+class HeuristicParser:
+    """启发式解析：按类名关键字模糊匹配，兼容标记不规范的实例，速度较慢"""
+
+    name = 'heuristic'
+
+    def __init__(self, debug_print=None):
+        self.debug_print = debug_print or (lambda message: None)
+
+    def parse(self, html: str, count: int):
+        items = []
+        soup = BeautifulSoup(html, 'html.parser')
+        self.debug_print("成功解析页面HTML")
+
+        # 输出页面基本结构
+        self.debug_print("\n=== 页面结构分析 ===")
+        self.debug_print(f"页面标题: {soup.title.string if soup.title else '无标题'}")
+
+        # 检查是否是错误页面
+        error_msg = soup.find(class_=lambda x: x and 'error' in str(x).lower())
+        if error_msg:
+            self.debug_print(f"⚠️ 检测到错误信息: {error_msg.get_text().strip()}")
+
+        # 查找推文容器
+        timeline = soup.find('div', class_='timeline')
+        self.debug_print("\n=== Timeline容器查找 ===")
+        if timeline:
+            self.debug_print("✅ 找到timeline容器")
+            self.debug_print(f"Timeline容器类名: {timeline.get('class', [])}")
+            tweet_items = timeline.find_all(['div', 'article'], class_=['timeline-item', 'tweet-card', 'tweet'])
+            self.debug_print(f"在timeline中找到 {len(tweet_items)} 条推文")
+        else:
+            self.debug_print("❌ 未找到timeline容器")
+            self.debug_print("检查所有div的class属性:")
+            for div in soup.find_all('div', class_=True):
+                self.debug_print(f"发现div，类名: {div.get('class', [])}")
+
+            self.debug_print("\n尝试直接查找推文...")
+            tweet_items = soup.find_all(['div', 'article'], class_=['timeline-item', 'tweet-card', 'tweet'])
+
+        self.debug_print(f"\n=== 推文查找结果 ===")
+        self.debug_print(f"找到 {len(tweet_items)} 条原始推文")
+
+        if not tweet_items:
+            self.debug_print("\n=== 使用备用选择器 ===")
+            self.debug_print("搜索包含tweet或timeline-item的所有元素")
+            tweet_items = soup.find_all(class_=lambda x: x and any(term in str(x).lower() for term in ['tweet', 'timeline-item']))
+            self.debug_print(f"使用备用选择器找到 {len(tweet_items)} 条推文")
+
+        for item in tweet_items:
+            if len(items) >= count:
+                break
+
+            # 获取推文内容
+            tweet_content = None
+            # 首先尝试精确匹配新发现的类名
+            tweet_content = item.find('div', class_='tweet-content media-body')
+
+            # 如果精确匹配失败，尝试现有的模糊匹配方案
+            if not tweet_content or not tweet_content.get_text().strip():
+                content_candidates = item.find_all(['div', 'p'], class_=lambda x: x and any(term in str(x).lower() for term in ['content', 'text', 'body']))
+
+                for candidate in content_candidates:
+                    if candidate.get_text().strip():
+                        tweet_content = candidate
+                        break
+
+            if not tweet_content:
+                self.debug_print("跳过一条无内容的推文")
+                continue
+
+            content_text = tweet_content.get_text().strip()
+            if not content_text:
+                self.debug_print("跳过一条空内容的推文")
+                continue
+
+            # 获取时间
+            time_element = item.find(['span', 'a'], class_=lambda x: x and any(term in str(x).lower() for term in ['date', 'time']))
+            tweet_time = "Unknown time"
+            if time_element:
+                tweet_time = time_element.get('title', None) or time_element.get_text().strip()
+
+            # 获取统计信息
+            stats = {}
+            stats_elements = item.find_all(['span', 'div'], class_=lambda x: x and any(term in str(x).lower() for term in ['stat', 'count', 'activity']))
+
+            for stat in stats_elements:
+                text = stat.get_text().strip().lower()
+                if 'retweet' in text or '转推' in text or 'rt' in text:
+                    match = re.search(r'\d+', text)
+                    if match:
+                        stats['retweets'] = match.group()
+                elif 'like' in text or '喜欢' in text:
+                    match = re.search(r'\d+', text)
+                    if match:
+                        stats['likes'] = match.group()
+
+            # 获取推文ID
+            tweet_id = None
+            tweet_link = item.find('a', class_=lambda x: x and any(term in str(x).lower() for term in ['link', 'tweet-link', 'tweet-date']))
+            if tweet_link and 'href' in tweet_link.attrs:
+                tweet_id = _parse_tweet_id(tweet_link['href'])
+
+            items.append({
+                "text": content_text,
+                "time": tweet_time,
+                "stats": stats,
+                "tweet_id": tweet_id,
+                "pinned": False,
+                "retweet": item.find(class_='retweet-header') is not None
+            })
+            self.debug_print(f"已处理第 {len(items)} 条推文，发布时间: {tweet_time}")
+
+        return items
+
+
+class SoupParser:
+    """快速解析：BeautifulSoup + 预编译CSS选择器，针对nitter的标准标记"""
+
+    name = 'soup'
+
+    ITEM = soupsieve.compile('div.timeline-item')
+    CONTENT = soupsieve.compile('.tweet-content')
+    DATE = soupsieve.compile('.tweet-date a')
+    STAT = soupsieve.compile('.tweet-stat')
+    LINK = soupsieve.compile('a.tweet-link')
+    PINNED = soupsieve.compile('.pinned')
+    RETWEET = soupsieve.compile('.retweet-header')
+
+    def __init__(self, debug_print=None):
+        self.features = 'lxml' if lxml_html is not None else 'html.parser'
+
+    def parse(self, html: str, count: int):
+        items = []
+        soup = BeautifulSoup(html, self.features)
+        for item in self.ITEM.select(soup):
+            if len(items) >= count:
+                break
+            content = self.CONTENT.select_one(item)
+            text = content.get_text().strip() if content else ''
+            if not text:
+                continue
+
+            date = self.DATE.select_one(item)
+            tweet_time = (date.get('title') or date.get_text().strip()) if date else "Unknown time"
+
+            stats = {}
+            for stat in self.STAT.select(item):
+                icon = stat.find('span', class_=True)
+                key = STAT_ICONS.get(icon['class'][0]) if icon else None
+                value = _parse_number(stat.get_text())
+                if key and value:
+                    stats[key] = value
+
+            link = self.LINK.select_one(item) or date
+            items.append({
+                "text": text,
+                "time": tweet_time,
+                "stats": stats,
+                "tweet_id": _parse_tweet_id(link.get('href') if link else None),
+                "pinned": self.PINNED.select_one(item) is not None,
+                "retweet": self.RETWEET.select_one(item) is not None
+            })
+        return items
+
+
+class LxmlParser:
+    """快速解析：lxml + 预编译XPath"""
+
+    name = 'lxml'
+
+    @staticmethod
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    def __init__(self, debug_print=None):
+        if lxml_html is None:
+            raise ImportError("lxml 未安装")
+        has_class = self._has_class
+        self.item_xpath = etree.XPath(f"//div[{has_class('timeline-item')}]")
+        self.content_xpath = etree.XPath(f".//*[{has_class('tweet-content')}]")
+        self.date_xpath = etree.XPath(f".//*[{has_class('tweet-date')}]/a")
+        self.stat_xpath = etree.XPath(f".//*[{has_class('tweet-stat')}]")
+        self.icon_xpath = etree.XPath(".//span[starts-with(@class, 'icon-')]/@class")
+        self.link_xpath = etree.XPath(f".//a[{has_class('tweet-link')}]/@href")
+        self.pinned_xpath = etree.XPath(f"boolean(.//*[{has_class('pinned')}])")
+        self.retweet_xpath = etree.XPath(f"boolean(.//*[{has_class('retweet-header')}])")
+
+    def parse(self, html: str, count: int):
+        items = []
+        root = lxml_html.fromstring(html)
+        for item in self.item_xpath(root):
+            if len(items) >= count:
+                break
+            content = self.content_xpath(item)
+            text = content[0].text_content().strip() if content else ''
+            if not text:
+                continue
+
+            date = self.date_xpath(item)
+            tweet_time = (date[0].get('title') or date[0].text_content().strip()) if date else "Unknown time"
+
+            stats = {}
+            for stat in self.stat_xpath(item):
+                icon = self.icon_xpath(stat)
+                key = STAT_ICONS.get(icon[0].split()[0]) if icon else None
+                value = _parse_number(stat.text_content())
+                if key and value:
+                    stats[key] = value
+
+            links = self.link_xpath(item)
+            href = links[0] if links else (date[0].get('href') if date else None)
+            items.append({
+                "text": text,
+                "time": tweet_time,
+                "stats": stats,
+                "tweet_id": _parse_tweet_id(href),
+                "pinned": self.pinned_xpath(item),
+                "retweet": self.retweet_xpath(item)
+            })
+        return items
+
+
+class SelectolaxParser:
+    """快速解析：selectolax（基于C实现的HTML解析器）"""
+
+    name = 'selectolax'
+
+    def __init__(self, debug_print=None):
+        if SelectolaxHTMLParser is None:
+            raise ImportError("selectolax 未安装")
+
+    def parse(self, html: str, count: int):
+        items = []
+        tree = SelectolaxHTMLParser(html)
+        for item in tree.css('div.timeline-item'):
+            if len(items) >= count:
+                break
+            content = item.css_first('.tweet-content')
+            text = content.text().strip() if content else ''
+            if not text:
+                continue
+
+            date = item.css_first('.tweet-date a')
+            tweet_time = (date.attributes.get('title') or date.text().strip()) if date else "Unknown time"
+
+            stats = {}
+            for stat in item.css('.tweet-stat'):
+                icon = stat.css_first('span[class^="icon-"]')
+                key = STAT_ICONS.get(icon.attributes.get('class', '').split()[0]) if icon else None
+                value = _parse_number(stat.text())
+                if key and value:
+                    stats[key] = value
+
+            link = item.css_first('a.tweet-link') or date
+            items.append({
+                "text": text,
+                "time": tweet_time,
+                "stats": stats,
+                "tweet_id": _parse_tweet_id(link.attributes.get('href') if link else None),
+                "pinned": item.css_first('.pinned') is not None,
+                "retweet": item.css_first('.retweet-header') is not None
+            })
+        return items
+
+
+PARSERS = {
+    parser.name: parser
+    for parser in (HeuristicParser, SoupParser, LxmlParser, SelectolaxParser)
+}
+
+def create_parser(name: str, debug_print=None):
+    """按名称创建解析器；auto 时选择已安装的最快后端"""
+    if name == 'auto':
+        if SelectolaxHTMLParser is not None:
+            name = 'selectolax'
+        elif lxml_html is not None:
+            name = 'lxml'
+        else:
+            name = 'soup'
+    if name not in PARSERS:
+        raise ValueError(f"未知的解析器: {name}，可选：auto, {', '.join(PARSERS)}")
+    return PARSERS[name](debug_print)
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """令牌桶限流：以固定速率补充令牌，允许不超过容量的突发"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """有足够令牌时立即取走并返回True，否则返回False"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1) -> float:
+        """距离有足够令牌还需等待的秒数"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        """等待直到取得令牌"""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+    def reserve(self, tokens: float = 1) -> float:
+        """预占令牌（允许欠账），返回需要等待的秒数；适合同步和异步调用方各自等待"""
+        self._refill()
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / self.rate)
+
+    def set_rate(self, rate: float):
+        """调整补充速率，已累积的令牌按旧速率结算"""
+        self._refill()
+        self.rate = rate
+
+
+class AdaptiveThrottle:
+    """按主机的自适应限流（AIMD）：空闲时不等待；遇到限流或质询时速率减半，之后每次成功逐步恢复"""
+
+    def __init__(self, max_rate: float, min_rate: float, burst: float):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.lock = threading.Lock()  # 同步请求可能在线程中执行
+        self.buckets = {}  # host -> TokenBucket
+        self.blocked_until = {}  # host -> 服务器要求的Retry-After截止时间
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.max_rate, self.burst)
+            self.buckets[host] = bucket
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """为一次请求预占名额，返回需要等待的秒数"""
+        with self.lock:
+            wait = self._bucket(host).reserve()
+            blocked = self.blocked_until.get(host, 0) - time.monotonic()
+        return max(wait, blocked)
+
+    def delay(self, host: str) -> float:
+        """现在请求该主机需要等待的秒数（不预占名额），调用方可据此改用其他主机"""
+        with self.lock:
+            wait = self._bucket(host).delay()
+            blocked = self.blocked_until.get(host, 0) - time.monotonic()
+        return max(wait, blocked, 0.0)
+
+    def wait(self, host: str):
+        """同步等待请求名额"""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, host: str):
+        """异步等待请求名额；等待中被取消（如对冲请求已有结果）时退还名额"""
+        delay = self.reserve(host)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                with self.lock:
+                    bucket = self._bucket(host)
+                    bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+                raise
+
+    def on_success(self, host: str):
+        """加性恢复：每次成功恢复最大速率的十分之一"""
+        with self.lock:
+            bucket = self._bucket(host)
+            if bucket.rate < self.max_rate:
+                bucket.set_rate(min(self.max_rate, bucket.rate + self.max_rate / 10))
+
+    def on_throttled(self, host: str, retry_after: float = None):
+        """乘性退避：速率减半，服务器给出Retry-After时在此之前不再请求"""
+        with self.lock:
+            bucket = self._bucket(host)
+            bucket.set_rate(max(self.min_rate, bucket.rate / 2))
+            if retry_after:
+                self.blocked_until[host] = time.monotonic() + retry_after
+
+    def rate(self, host: str) -> float:
+        with self.lock:
+            return self._bucket(host).rate
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+class SingleFlight:
+    """合并相同key的并发调用，并在短时间内缓存结果"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.inflight = {}  # key -> 进行中的Future
+        self.results = {}  # key -> (过期时间, 结果)
+
+    async def do(self, key, func, should_cache=lambda result: True):
+        """执行func()；相同key已在执行时等待其结果，TTL内直接返回缓存结果"""
+        cached = self.results.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.inflight[key] = future
+            future.add_done_callback(lambda f: self._on_done(key, f, should_cache))
+        # 单个等待者被取消时不影响其他共享该结果的调用
+        return await asyncio.shield(future)
+
+    def _on_done(self, key, future, should_cache):
+        self.inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if self.ttl > 0 and should_cache(result):
+            now = time.monotonic()
+            self.results[key] = (now + self.ttl, result)
+            # 顺便清理过期结果，避免缓存无限增长
+            if len(self.results) > 1024:
+                self.results = {k: v for k, v in self.results.items() if v[0] > now}
@@ -0,0 +1,57 @@
+import re
+from typing import NamedTuple
+
+PIN_MARKER = '📌'
+
+# 一次扫描同时识别所有需要处理的片段：
+# 置顶标识、@用户名、nitter日期（如 Jan 28 / Jan 28, 2024）、相对时间（如 5h / 2d）、链接、空白
+TOKEN_RE = re.compile(
+    r'(?P<pinned>Pinned|📌)\s*'
+    r'|(?<!\S)@(?P<mention>\w+)\S*\s*'
+    r'|(?<!\S)(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{1,2}(?:, \d{4})?(?!\S)\s*'
+    r'|(?<!\S)\d+[hdm](?!\S)\s*'
+    r'|(?P<link>https?://\S+)'
+    r'|\s+'
+)
+
+
+class NormalizedTweet(NamedTuple):
+    text: str  # 清理后的正文（不含置顶标识）
+    pinned: bool
+    mentions: tuple
+    links: tuple
+
+    @property
+    def key(self) -> str:
+        """用于去重和缓存的归一化键"""
+        return (PIN_MARKER + ' ' if self.pinned else '') + self.text.lower()
+
+    @property
+    def display_text(self) -> str:
+        """展示用文本，置顶推文带📌前缀"""
+        return f"{PIN_MARKER} {self.text}" if self.pinned else self.text
+
+
+def normalize_tweet_text(text: str) -> NormalizedTweet:
+    """单次扫描清理推文文本：移除@用户名、日期和相对时间，识别置顶标识，提取提及和链接"""
+    mentions = []
+    links = []
+    pinned = False
+
+    def replace(match):
+        nonlocal pinned
+        kind = match.lastgroup
+        if kind == 'pinned':
+            pinned = True
+            return ''
+        if kind == 'mention':
+            mentions.append(match.group('mention'))
+            return ''
+        if kind == 'link':
+            links.append(match.group('link'))
+            return match.group('link')
+        # 空白合并为一个空格，日期和相对时间直接移除
+        return ' ' if match.group().isspace() else ''
+
+    cleaned = TOKEN_RE.sub(replace, text).strip()
+    return NormalizedTweet(cleaned, pinned, tuple(mentions), tuple(links))
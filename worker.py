@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+from database.models import engine
+from database.queue import JobQueue
+from telegram_bot.scheduler import TaskScheduler
+from config import Config
+
+async def maintain(scheduler: TaskScheduler):
+    """定期维护nitter实例注册表"""
+    while True:
+        await scheduler.maintain_instances()
+        await asyncio.sleep(60)
+
+async def consume(queue: JobQueue, scheduler: TaskScheduler, name: str):
+    """循环领取并执行队列中的任务"""
+    while True:
+        job = await asyncio.to_thread(queue.claim, name)
+        if job is None:
+            await asyncio.sleep(Config.WORKER_POLL_INTERVAL)
+            continue
+        job_id, kind, payload, attempts = job
+        try:
+            result = await scheduler.run_job(kind, payload)
+            await asyncio.to_thread(queue.complete, job_id, result)
+        except Exception as e:
+            print(f"Job {job_id} failed (attempt {attempts}): {str(e)}")
+            await asyncio.to_thread(queue.fail, job_id, str(e), attempts)
+
+async def run_worker(name: str):
+    """运行一个worker进程：抓取和总结，结果写回队列由bot进程发送"""
+    queue = JobQueue()
+    scheduler = TaskScheduler()
+    print(f"Worker {name} started")
+    try:
+        await asyncio.gather(
+            maintain(scheduler),
+            *[consume(queue, scheduler, f"{name}-{i}") for i in range(Config.WORKER_CONCURRENCY)]
+        )
+    finally:
+        await scheduler.shutdown()
+
+def worker_main(index: int):
+    name = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    # 子进程不复用父进程连接池中的连接
+    engine.dispose(close=False)
+    try:
+        asyncio.run(run_worker(name))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    # 启动多个worker进程，吞吐量随CPU核数扩展；worker可随时重启，未完成的任务超时后会被重新领取
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(index,))
+        for index in range(max(1, Config.WORKER_PROCESSES))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\nWorkers stopped gracefully")